@@ -0,0 +1,99 @@
+import logging
+
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import aget_cached_name_response, name_negative_cache
+from .counters import request_counter
+from .metrics import NAME_LOOKUPS
+from .models import UniqueName
+from .routers import apin_primary_if_written, pin_primary
+from .singleflight import async_name_flight
+from .tasks import name_refresher
+from .views import (
+    acreate_name_object,
+    build_name_response,
+    expand_name_data,
+    failed_name_response,
+    name_stats_schema,
+    parse_name_params,
+    popular_names_response,
+    popular_names_schema,
+    unresolved_name_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNameStatsView(APIView):
+    """
+    Async version of NameStatsView served under ASGI.
+    Cold lookups await nationalize API on the event loop instead of holding a worker thread,
+    only short database work runs in a thread
+    """
+
+    @name_stats_schema
+    async def get(self, request, *args, **kwargs):
+        name_param, expand, error_response = parse_name_params(request)
+        if error_response:
+            return error_response
+
+        # Name is cached and data is fresh
+        cached_data = await aget_cached_name_response(name_param)
+        if cached_data:
+            NAME_LOOKUPS.labels('hit').inc()
+            request_counter.increment(name_param)
+            cached_data['requests_count'] += request_counter.pending(name_param)
+            logger.info(f'Cached answer for {name_param} returned successfully')
+            return Response(expand_name_data(cached_data, expand), status=status.HTTP_200_OK)
+
+        await apin_primary_if_written(name_param)
+        name_object = await UniqueName.objects.filter(name=name_param).afirst()
+        if name_object:
+            request_counter.increment(name_param)
+
+            # Name exists in DB and data is not fresh: answering with stored data, refreshing in background
+            if timezone.now() - name_object.refreshed_at >= settings.NAME_FRESHNESS:
+                NAME_LOOKUPS.labels('stale').inc()
+                if name_refresher.enqueue(name_param):
+                    logger.info(f'Refresh for stale name {name_param} was queued')
+            else:
+                NAME_LOOKUPS.labels('miss').inc()
+
+        # If no name data in base. Concurrent requests for the name await a single upstream fetch
+        else:
+            # Names nationalize API has no predictions for are not requested again until their negative entry expires
+            unresolved = await name_negative_cache.aget(name_param)
+            if unresolved:
+                NAME_LOOKUPS.labels('negative').inc()
+                return unresolved_name_response(unresolved)
+
+            # A replica may not have the name yet, the rest of the request reads what the primary has
+            pin_primary()
+            (name_object, created), shared = await async_name_flight.do(name_param, acreate_name_object, name_param)
+            NAME_LOOKUPS.labels('cold').inc()
+            if not name_object:
+                # Estimates render countries from the country cache, which may have to load them from database
+                unresolved = await name_negative_cache.aget(name_param)
+                return await sync_to_async(failed_name_response)(name_param, unresolved, expand)
+            if shared or not created:
+                request_counter.increment(name_param)
+
+        final_data = await sync_to_async(build_name_response)(name_object, name_param)
+
+        logger.info(f'Answer for {name_param} returned successfully')
+        return Response(expand_name_data(final_data, expand), status=status.HTTP_200_OK)
+
+
+class AsyncPopularNamesByCountryView(APIView):
+    """
+    Async version of PopularNamesByCountryView served under ASGI
+    """
+
+    @popular_names_schema
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(popular_names_response)(request)
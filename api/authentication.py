@@ -0,0 +1,27 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key: str) -> str:
+    # Token keys are credentials, so the cache only sees their digest
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication resolving tokens (with their users) from the shared cache for
+    AUTH_TOKEN_CACHE_TTL seconds, so warm requests don't query the token and user tables.
+    Entries are dropped when a token is deleted or its user is saved, see signals
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            # Invalid tokens and inactive users are rejected here and never cached
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+        return token.user, token
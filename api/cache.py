@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import threading
+import time
+
+import orjson
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Country
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_country(country: Country) -> dict:
+    # Imported here as serializers use the cache themselves
+    from .serializers import CountrySerializer
+
+    return dict(CountrySerializer(country).data)
+
+
+class CountryCache:
+    """
+    Process-level read-through cache of serialized Country objects keyed by code.
+
+    The whole (small and rarely changing) table is loaded on first use and reloaded
+    after `ttl` seconds or after invalidation. Invalidating bumps a version kept in the shared
+    name cache, checked every VERSION_CHECK_INTERVAL seconds, so other processes reload too.
+    Modification times are kept next to the serialized countries for the countries endpoint.
+    """
+
+    VERSION_KEY = 'countries:version'
+    VERSION_CHECK_INTERVAL = 5.0
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._countries = {}
+        self._updated_at = {}
+        self._catalogue = None
+        self._loaded_at = None
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_cache():
+        return caches[settings.NAME_RESPONSE_CACHE]
+
+    def _is_fresh(self) -> bool:
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+            return False
+        if now - self._version_checked_at >= self.VERSION_CHECK_INTERVAL:
+            self._version_checked_at = now
+            return self._shared_cache().get(self.VERSION_KEY, 0) == self._version
+        return True
+
+    def _bump_version(self) -> int:
+        cache = self._shared_cache()
+        try:
+            return cache.incr(self.VERSION_KEY)
+        except ValueError:
+            if cache.add(self.VERSION_KEY, 1, timeout=None):
+                return 1
+            return cache.incr(self.VERSION_KEY)
+
+    def load(self) -> None:
+        """
+        Loading every country from database in one query
+        """
+        # Read first, so a change made while loading is picked up on the next check
+        version = self._shared_cache().get(self.VERSION_KEY, 0)
+        countries = {}
+        updated_at = {}
+        for country in Country.objects.order_by('code'):
+            countries[country.code] = serialize_country(country)
+            updated_at[country.code] = country.updated_at
+        with self._lock:
+            self._countries = countries
+            self._updated_at = updated_at
+            self._catalogue = None
+            self._loaded_at = self._version_checked_at = time.monotonic()
+            self._version = version
+        logger.info(f'Country cache loaded with {len(countries)} countries')
+
+    def get(self, code: str) -> dict or None:
+        """
+        Getting a serialized country, loading it from database on a miss
+        """
+        if not self._is_fresh():
+            self.load()
+
+        data = self._countries.get(code)
+        if data is None:
+            country = Country.objects.filter(code=code).first()
+            if country is None:
+                return None
+            data = serialize_country(country)
+            with self._lock:
+                self._countries[code] = data
+                self._updated_at[code] = country.updated_at
+        return data
+
+    def get_updated_at(self, code: str):
+        """
+        Getting the modification time of a country loaded by `get`
+        """
+        return self._updated_at.get(code)
+
+    def catalogue(self) -> tuple:
+        """
+        Getting every serialized country with the ETag and Last-Modified of the whole list,
+        computed once per load. Returns (countries, etag, last_modified)
+        """
+        catalogue = self._catalogue
+        if catalogue is None or not self._is_fresh():
+            self.load()
+            with self._lock:
+                countries = list(self._countries.values())
+                catalogue = self._catalogue = (
+                    countries,
+                    hashlib.md5(orjson.dumps(countries)).hexdigest(),
+                    max(self._updated_at.values(), default=None),
+                )
+        return catalogue
+
+    def invalidate(self, code: str = None) -> None:
+        """
+        Dropping one country or, without a code, the whole cache, in every process
+        """
+        version = self._bump_version()
+        with self._lock:
+            if code is None:
+                self._countries = {}
+                self._loaded_at = None
+            else:
+                self._countries.pop(code, None)
+                self._updated_at.pop(code, None)
+                # This process is current again unless another one changed countries too
+                if self._version == version - 1:
+                    self._version = version
+            self._catalogue = None
+
+
+country_cache = CountryCache(ttl=settings.COUNTRY_CACHE_TTL)
+
+
+def name_response_cache_key(name: str) -> str:
+    return f'names:response:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def name_count_cache_key(name: str) -> str:
+    return f'names:count:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def merge_cached_name_response(cached: dict, name: str) -> dict or None:
+    # The request count of the cached payload is replaced by the separately cached, current one
+    data = cached.get(name_response_cache_key(name))
+    count = cached.get(name_count_cache_key(name))
+    if data is None or count is None:
+        return None
+    return {**data, 'requests_count': count}
+
+
+def get_cached_name_response(name: str) -> dict or None:
+    """
+    Getting the cached name-stats payload shared by all workers with the flushed request count
+    of the name; requests not flushed yet are added by the caller
+    """
+    keys = [name_response_cache_key(name), name_count_cache_key(name)]
+    return merge_cached_name_response(caches[settings.NAME_RESPONSE_CACHE].get_many(keys), name)
+
+
+async def aget_cached_name_response(name: str) -> dict or None:
+    keys = [name_response_cache_key(name), name_count_cache_key(name)]
+    return merge_cached_name_response(await caches[settings.NAME_RESPONSE_CACHE].aget_many(keys), name)
+
+
+def set_cached_name_response(name: str, data: dict, refreshed_at, request_count: int) -> None:
+    """
+    Caching the name-stats payload until its data goes stale, and the flushed request count
+    for NAME_COUNT_CACHE_TTL seconds, after which it is read from database again
+    """
+    timeout = (refreshed_at + settings.NAME_FRESHNESS - timezone.now()).total_seconds()
+    if timeout > 0:
+        caches[settings.NAME_RESPONSE_CACHE].set_many(
+            {name_response_cache_key(name): data},
+            timeout=timeout,
+        )
+        caches[settings.NAME_RESPONSE_CACHE].set(
+            name_count_cache_key(name), request_count, timeout=min(timeout, settings.NAME_COUNT_CACHE_TTL)
+        )
+
+
+def add_cached_name_counts(names: list[str], count: int) -> None:
+    """
+    Adding flushed requests to the cached counts of names, so cached answers keep up with database
+    """
+    cache = caches[settings.NAME_RESPONSE_CACHE]
+    for name in names:
+        try:
+            cache.incr(name_count_cache_key(name), count)
+        except ValueError:
+            # Not cached, the next answer reads the count from database
+            pass
+
+
+def invalidate_cached_name_response(name: str) -> None:
+    caches[settings.NAME_RESPONSE_CACHE].delete_many([name_response_cache_key(name), name_count_cache_key(name)])
+
+
+class NegativeCache:
+    """
+    Shared record of keys an upstream API could not resolve, which are not requested from it
+    again until their entry expires.
+
+    The first failure of a key is remembered for NEGATIVE_CACHE_TTL seconds and every further one
+    twice as long, up to NEGATIVE_CACHE_MAX_TTL. Failure counts outlive the entries by
+    NEGATIVE_CACHE_MAX_TTL, so a key that keeps failing keeps backing off.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def _cache_key(self, key: str) -> str:
+        return f'negative:{self.kind}:{hashlib.md5(key.encode()).hexdigest()}'
+
+    @staticmethod
+    def _active(entry: dict or None) -> dict or None:
+        return entry if entry and entry['expires_at'] > time.time() else None
+
+    def get(self, key: str) -> dict or None:
+        """
+        Getting the entry of a key while it is not to be requested
+        """
+        return self._active(caches[settings.NAME_RESPONSE_CACHE].get(self._cache_key(key)))
+
+    async def aget(self, key: str) -> dict or None:
+        return self._active(await caches[settings.NAME_RESPONSE_CACHE].aget(self._cache_key(key)))
+
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Getting the entries of the keys not to be requested, by key
+        """
+        cache_keys = {self._cache_key(key): key for key in keys}
+        entries = caches[settings.NAME_RESPONSE_CACHE].get_many(list(cache_keys))
+        return {
+            cache_keys[cache_key]: entry for cache_key, entry in entries.items() if self._active(entry)
+        }
+
+    def record(self, key: str) -> dict:
+        """
+        Recording a failure of a key, returns its new entry
+        """
+        cache = caches[settings.NAME_RESPONSE_CACHE]
+        previous = cache.get(self._cache_key(key))
+        failures = previous['failures'] + 1 if previous else 1
+        ttl = min(settings.NEGATIVE_CACHE_TTL * 2 ** (failures - 1), settings.NEGATIVE_CACHE_MAX_TTL)
+        entry = {'failures': failures, 'expires_at': time.time() + ttl}
+        cache.set(self._cache_key(key), entry, timeout=ttl + settings.NEGATIVE_CACHE_MAX_TTL)
+        logger.info(f'Negative {self.kind} cache entry for {key} kept for {ttl}s after {failures} failures')
+        return entry
+
+    @staticmethod
+    def state(entry: dict) -> dict:
+        """
+        Describing an entry for API responses
+        """
+        return {'failures': entry['failures'], 'retry_after': max(int(entry['expires_at'] - time.time()), 0)}
+
+
+name_negative_cache = NegativeCache('name')
+country_negative_cache = NegativeCache('country')
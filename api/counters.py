@@ -0,0 +1,106 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import add_cached_name_counts
+from .leaderboard import add_name_requests, record_name_requests
+from .models import UniqueName
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCounter:
+    """
+    In-process accumulator of name request counts.
+
+    Requests only increment an in-memory counter; a background thread flushes the
+    accumulated counts every REQUEST_COUNT_FLUSH_INTERVAL seconds with one
+    `F()` UPDATE per distinct increment, so concurrent requests never lose counts
+    and the read path never writes to the database. Every flush also appends one
+    hourly request bucket row per name for the windowed popularity rankings.
+    """
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self._pending[name] += 1
+        self._ensure_flusher()
+
+    def pending(self, name: str) -> int:
+        """
+        Getting the number of requests for a name not flushed to database yet
+        """
+        with self._lock:
+            return self._pending[name]
+
+    def flush(self) -> int:
+        """
+        Writing accumulated counts to database, returns the number of flushed requests
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        names_by_count = defaultdict(list)
+        for name, count in pending.items():
+            names_by_count[count].append(name)
+
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                for count, names in names_by_count.items():
+                    UniqueName.objects.filter(name__in=names).update(
+                        request_count=F('request_count') + count,
+                        last_accessed_at=now,
+                    )
+                    add_name_requests(names, count)
+                # Time-bucketed copy of the counts for the popular names windows
+                record_name_requests(pending, now)
+        except DatabaseError as e:
+            logger.error(f'Could not flush request counts for {len(pending)} names: {e}')
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+
+        for count, names in names_by_count.items():
+            add_cached_name_counts(names, count)
+        flushed = sum(pending.values())
+        logger.info(f'Flushed {flushed} requests for {len(pending)} names')
+        return flushed
+
+    def _ensure_flusher(self) -> None:
+        if settings.REQUEST_COUNT_FLUSH_INTERVAL <= 0:
+            return
+        # The thread does not survive a fork, so every worker process starts its own
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='request-counter-flush', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        while settings.REQUEST_COUNT_FLUSH_INTERVAL > 0:
+            time.sleep(settings.REQUEST_COUNT_FLUSH_INTERVAL)
+            close_old_connections()
+            self.flush()
+
+
+request_counter = RequestCounter()
+atexit.register(request_counter.flush)
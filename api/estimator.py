@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# magic, version, byte order (0 little, 1 big), min n, max n, n-grams, entries, countries
+HEADER = struct.Struct('<4sHBBBxxxIII')
+MAGIC = b'NBNG'
+VERSION = 1
+CODE_SIZE = 3
+# Seconds between checks of the model file for a newer build
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+def name_grams(name: str, min_n: int, max_n: int) -> set[str]:
+    """
+    Character n-grams of a name, with its start and end marked so prefixes and suffixes
+    ("^an", "ew$") are told apart from the same letters inside the name
+    """
+    padded = f'^{name}$'
+    return {padded[start:start + n] for n in range(min_n, max_n + 1) for start in range(len(padded) - n + 1)}
+
+
+def gram_key(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'little')
+
+
+def build_name_model(predictions, path: Path, min_n: int = 2, max_n: int = 4, top_countries: int = 8) -> dict:
+    """
+    Writing the model file from (name, {country_code: probability}) pairs. Every n-gram keeps the
+    distribution of the probabilities of the names containing it over its top countries.
+    The file is replaced atomically, so processes that mapped the previous one keep reading it
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    names = 0
+    for name, probabilities in predictions:
+        names += 1
+        for gram in name_grams(name, min_n, max_n):
+            weights = totals[gram_key(gram)]
+            for country_code, probability in probabilities.items():
+                weights[country_code] += probability
+
+    codes = sorted({country_code for weights in totals.values() for country_code in weights})
+    code_index = {country_code: index for index, country_code in enumerate(codes)}
+    keys = array('Q', sorted(totals))
+    offsets = array('I', [0])
+    entry_weights = array('f')
+    entry_countries = array('H')
+    for key in keys:
+        weights = totals[key]
+        total = sum(weights.values()) or 1.0
+        for country_code, weight in sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top_countries]:
+            entry_weights.append(weight / total)
+            entry_countries.append(code_index[country_code])
+        offsets.append(len(entry_weights))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'{path.name}.tmp')
+    with temporary_path.open('wb') as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, sys.byteorder == 'big', min_n, max_n, len(keys), len(entry_weights), len(codes)
+        ))
+        # Arrays are written in native byte order, widest items first so every one stays aligned
+        for values in (keys, offsets, entry_weights, entry_countries):
+            values.tofile(file)
+        file.write(b''.join(country_code.encode().ljust(CODE_SIZE, b'\0') for country_code in codes))
+    os.replace(temporary_path, path)
+
+    return {'names': names, 'grams': len(keys), 'entries': len(entry_weights), 'countries': len(codes)}
+
+
+class NameModel:
+    """
+    Character n-gram model of name nationality built by `manage.py train_name_model`,
+    memory-mapped read-only when a worker starts. Preloaded workers share the mapped pages,
+    and a lookup is a binary search per n-gram, with no database or network involved.
+
+    A rebuilt model replaces the file, so every process maps the new file on its next
+    prediction after the change is noticed, without a restart
+    """
+
+    def __init__(self):
+        self._keys = None
+        self.path = None
+        self._file_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._keys is not None
+
+    def load(self, path: Path) -> bool:
+        """
+        Mapping the model file, returns False if there is none or it can't be read
+        """
+        self.path = Path(path)
+        self._checked_at = time.monotonic()
+        try:
+            with open(path, 'rb') as file:
+                file_id = self._stat_id(os.fstat(file.fileno()))
+                # Remembered even for a file that can't be used, so it isn't retried until it changes
+                self._file_id = file_id
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, big_endian, min_n, max_n, gram_count, entry_count, country_count = (
+                HEADER.unpack_from(data)
+            )
+        except FileNotFoundError:
+            self._file_id = None
+            logger.info(f'No name model at {path}, estimates are disabled')
+            return False
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f'Could not map name model {path}: {e}')
+            return False
+        if magic != MAGIC or version != VERSION or big_endian != (sys.byteorder == 'big'):
+            logger.error(f'Name model {path} has an unsupported format, rebuild it with train_name_model')
+            return False
+
+        view = memoryview(data)
+        position = HEADER.size
+        sections = {}
+        for section, type_code, count in (
+            ('keys', 'Q', gram_count),
+            ('offsets', 'I', gram_count + 1),
+            ('weights', 'f', entry_count),
+            ('countries', 'H', entry_count),
+        ):
+            size = count * array(type_code).itemsize
+            sections[section] = view[position:position + size].cast(type_code)
+            position += size
+        codes = view[position:position + country_count * CODE_SIZE].tobytes()
+
+        self.min_n, self.max_n = min_n, max_n
+        self._offsets = sections['offsets']
+        self._weights = sections['weights']
+        self._countries = sections['countries']
+        self._codes = [
+            codes[index:index + CODE_SIZE].rstrip(b'\0').decode() for index in range(0, len(codes), CODE_SIZE)
+        ]
+        self._keys = sections['keys']
+        logger.info(f'Name model with {gram_count} n-grams and {country_count} countries mapped from {path}')
+        return True
+
+    @staticmethod
+    def _stat_id(stat: os.stat_result) -> tuple:
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def reload_if_changed(self) -> None:
+        """
+        Mapping the model file again if it was replaced since it was mapped, checked at most
+        every RELOAD_CHECK_INTERVAL seconds. The previous mapping stays valid for readers still using it
+        """
+        if self.path is None or time.monotonic() - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < RELOAD_CHECK_INTERVAL:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                file_id = self._stat_id(os.stat(self.path))
+            except OSError:
+                file_id = None
+            if file_id != self._file_id:
+                self.load(self.path)
+
+    def predict(self, name: str, limit: int = 5) -> list[dict] or None:
+        """
+        Estimating country probabilities of a name in the nationalize API format, None if the model
+        is not loaded or knows none of the name's n-grams. Longer n-grams weigh more
+        """
+        self.reload_if_changed()
+        if self._keys is None:
+            return None
+        keys, offsets, weights, countries = self._keys, self._offsets, self._weights, self._countries
+        scores = defaultdict(float)
+        for gram in name_grams(name, self.min_n, self.max_n):
+            key = gram_key(gram)
+            index = bisect_left(keys, key)
+            if index == len(keys) or keys[index] != key:
+                continue
+            start, end = offsets[index], offsets[index + 1]
+            for country, weight in zip(countries[start:end].tolist(), weights[start:end].tolist(), strict=True):
+                scores[country] += len(gram) * weight
+        if not scores:
+            return None
+
+        total = sum(scores.values())
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [{'country_id': self._codes[country], 'probability': score / total} for country, score in top]
+
+
+name_model = NameModel()
+
+
+def load_name_model() -> bool:
+    return name_model.load(settings.NAME_MODEL_PATH)
@@ -0,0 +1,198 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Sum
+
+from .models import (
+    CountryNameRank,
+    CountryNameWindowRank,
+    NameCountryProbability,
+    NameRequestBucket,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def update_name_ranks(names: list[str]) -> None:
+    """
+    Upserting leaderboard rows of names from their current probabilities, removing rows of
+    countries that dropped out of their predictions. Request counts are only copied into new rows;
+    existing ones keep theirs, which flushes increment concurrently with F(), and get their score
+    recomputed from it
+    """
+    rows = NameCountryProbability.objects.filter(name__in=names).values_list(
+        'name_id', 'country_id', 'probability', 'name__request_count'
+    )
+    CountryNameRank.objects.bulk_create(
+        [
+            CountryNameRank(
+                name_id=name,
+                country_id=country_code,
+                probability=probability,
+                request_count=request_count,
+                weighted_score=request_count * probability,
+            )
+            for name, country_code, probability, request_count in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['country', 'name'],
+        update_fields=['probability'],
+    )
+    CountryNameRank.objects.filter(name__in=names).update(weighted_score=F('request_count') * F('probability'))
+    CountryNameRank.objects.filter(name__in=names).exclude(
+        Exists(NameCountryProbability.objects.filter(name=OuterRef('name'), country=OuterRef('country')))
+    ).delete()
+
+
+def add_name_requests(names: list[str], count: int) -> None:
+    """
+    Adding flushed requests to leaderboard rows of names
+    """
+    CountryNameRank.objects.filter(name__in=names).update(
+        request_count=F('request_count') + count,
+        weighted_score=F('weighted_score') + F('probability') * count,
+    )
+
+
+def rebuild_leaderboard(batch_size: int = 5000) -> int:
+    """
+    Rebuilding the whole leaderboard from probabilities and request counts
+    """
+    rows = NameCountryProbability.objects.values_list(
+        'name_id', 'country_id', 'probability', 'name__request_count'
+    ).iterator(chunk_size=batch_size)
+
+    with transaction.atomic():
+        CountryNameRank.objects.all().delete()
+        total = bulk_insert(
+            CountryNameRank,
+            (
+                CountryNameRank(
+                    name_id=name,
+                    country_id=country_code,
+                    probability=probability,
+                    request_count=request_count,
+                    weighted_score=request_count * probability,
+                )
+                for name, country_code, probability, request_count in rows
+            ),
+            batch_size,
+        )
+
+    logger.info(f'Leaderboard rebuilt with {total} rows')
+    return total
+
+
+def bulk_insert(model, objects, batch_size: int) -> int:
+    """
+    Inserting objects from an iterable in batches, without holding them all in memory
+    """
+    total = 0
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def bucket_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(window: str, now):
+    """
+    Getting the first hourly bucket of a window ending with the current, partial hour
+    """
+    return bucket_hour(now) - settings.POPULAR_NAMES_WINDOWS[window] + timedelta(hours=1)
+
+
+def record_name_requests(counts: dict, now) -> None:
+    """
+    Appending flushed requests to the hourly buckets of names, one row per name and flush
+    """
+    hour = bucket_hour(now)
+    NameRequestBucket.objects.bulk_create(
+        [NameRequestBucket(name_id=name, hour=hour, request_count=count) for name, count in counts.items()]
+    )
+
+
+def compact_request_buckets(now, lookback: timedelta = timedelta(days=1)) -> tuple:
+    """
+    Merging the rows of past hours within the lookback into one row per name, and deleting hours
+    no window reaches anymore. Buckets are only appended to while their hour is current, so hours
+    compacted once stay compacted. Returns (merged rows removed, expired rows deleted)
+    """
+    current_hour = bucket_hour(now)
+    expired, _ = NameRequestBucket.objects.filter(
+        hour__lt=min(window_start(window, now) for window in settings.POPULAR_NAMES_WINDOWS)
+    ).delete()
+
+    hours = list(
+        NameRequestBucket.objects.filter(hour__gte=current_hour - lookback, hour__lt=current_hour)
+        .values('hour')
+        .annotate(rows=Count('id'), names=Count('name', distinct=True))
+        .filter(rows__gt=F('names'))
+        .values_list('hour', flat=True)
+    )
+    merged = 0
+    for hour in hours:
+        with transaction.atomic():
+            # Rows appended by a late flush while merging are left for the next run
+            rows = NameRequestBucket.objects.filter(hour=hour)
+            rows = rows.filter(id__lte=rows.aggregate(last_id=Max('id'))['last_id'])
+            totals = list(rows.values('name_id').annotate(total=Sum('request_count')).values_list('name_id', 'total'))
+            deleted, _ = rows.delete()
+            NameRequestBucket.objects.bulk_create(
+                [NameRequestBucket(name_id=name, hour=hour, request_count=total) for name, total in totals],
+                batch_size=5000,
+            )
+        merged += deleted - len(totals)
+    return merged, expired
+
+
+def rebuild_window_ranks(window: str, now, batch_size: int = 5000) -> int:
+    """
+    Rebuilding the leaderboard of a window from the request buckets it covers and current probabilities.
+    Readers keep seeing the previous ranks until the new ones are committed
+    """
+    rows = (
+        NameCountryProbability.objects.filter(name__request_buckets__hour__gte=window_start(window, now))
+        .values('name_id', 'country_id', 'probability')
+        .annotate(request_count=Sum('name__request_buckets__request_count'))
+        .values_list('name_id', 'country_id', 'probability', 'request_count')
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    with transaction.atomic():
+        CountryNameWindowRank.objects.filter(window=window).delete()
+        total = bulk_insert(
+            CountryNameWindowRank,
+            (
+                CountryNameWindowRank(
+                    window=window,
+                    name_id=name,
+                    country_id=country_code,
+                    request_count=request_count,
+                    weighted_score=request_count * probability,
+                )
+                for name, country_code, probability, request_count in rows
+            ),
+            batch_size,
+        )
+    return total
+
+
+def rollup_requests(now, lookback: timedelta = timedelta(days=1)) -> dict:
+    """
+    Compacting the request buckets and rebuilding the leaderboard of every window
+    """
+    merged, expired = compact_request_buckets(now, lookback)
+    ranks = {window: rebuild_window_ranks(window, now) for window in settings.POPULAR_NAMES_WINDOWS}
+    logger.info(f'Request buckets rolled up: {merged} rows merged, {expired} expired, window ranks {ranks}')
+    return {'merged': merged, 'expired': expired, 'ranks': ranks}
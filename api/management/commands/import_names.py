@@ -0,0 +1,185 @@
+import csv
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import UniqueName
+from api.names import normalize_name
+from api.views import create_name_objects, parse_names_data
+
+logger = logging.getLogger(__name__)
+
+
+def read_names(path: Path, file_format: str, field: str):
+    """
+    Streaming names from a CSV file (column `field`, or the first one without a header) or
+    a JSONL file (key `field` of every object, or plain strings), one row at a time
+    """
+    with path.open(encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            rows = csv.reader(file)
+            header = next(rows, None)
+            if header is None:
+                return
+            if field in header:
+                index = header.index(field)
+            else:
+                index = 0
+                yield header[0].strip() if header else ''
+            for row in rows:
+                yield row[index].strip() if len(row) > index else ''
+        else:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    yield ''
+                    continue
+                record = json.loads(line)
+                yield str(record.get(field, '') if isinstance(record, dict) else record).strip()
+
+
+class Command(BaseCommand):
+    help = (
+        'Pre-populates names and their predictions from a CSV or JSONL file of names. The file is streamed '
+        'and resolved against nationalize API in rate-limited batches; progress is checkpointed after every '
+        'committed chunk, so an interrupted import resumes where it stopped when run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help='CSV or JSONL file of names.')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='File format, detected from the file extension by default.',
+        )
+        parser.add_argument(
+            '--field',
+            default='name',
+            help='CSV column or JSONL key holding the name (default "name").',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Names written per transaction and checkpoint (default 1000).',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=5.0,
+            help='Nationalize API requests per second, 0 for no limit (default 5).',
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=5,
+            help='Attempts with exponential backoff for a failing nationalize batch before stopping (default 5).',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=Path,
+            help='Checkpoint file, <path>.checkpoint by default.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and start from the beginning of the file.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.exists():
+            raise CommandError(f'File {path} does not exist')
+        file_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        self.checkpoint_path = options['checkpoint'] or path.with_name(f'{path.name}.checkpoint')
+        self.rate = options['rate']
+        self.retries = options['retries']
+        self.last_request = 0.0
+        self.created = self.unresolved = 0
+
+        position = 0
+        if self.checkpoint_path.exists() and not options['restart']:
+            position = json.loads(self.checkpoint_path.read_text())['position']
+            self.stdout.write(f'Resuming {path} after {position} rows')
+
+        max_length = UniqueName._meta.get_field('name').max_length
+        chunk = {}
+        try:
+            for row, name in enumerate(read_names(path, file_format, options['field']), 1):
+                if row <= position:
+                    continue
+                name = normalize_name(name)
+                if name and len(name) <= max_length:
+                    chunk.setdefault(name, None)
+                elif name:
+                    logger.warning(f'Name in row {row} is longer than {max_length} characters, skipped')
+                if len(chunk) >= options['chunk_size']:
+                    self.import_chunk(list(chunk))
+                    self.save_checkpoint(row)
+                    chunk = {}
+                position = row
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {path} after row {position}: {e}') from e
+        if chunk:
+            self.import_chunk(list(chunk))
+        self.checkpoint_path.unlink(missing_ok=True)
+
+        logger.info(f'{self.created} names imported from {path}, {self.unresolved} unresolved')
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.created} names imported, {self.unresolved} not resolved by nationalize API'
+        ))
+
+    def import_chunk(self, names: list[str]) -> None:
+        """
+        Resolving the names of a chunk missing from database and storing them in one transaction
+        """
+        existing = set(UniqueName.objects.filter(name__in=names).values_list('name', flat=True))
+        missing = [name for name in names if name not in existing]
+
+        nationalize_data = []
+        batch_size = settings.NATIONALIZE_BATCH_SIZE
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            nationalize_data.extend(
+                name_data for name_data in self.fetch_batch(batch)
+                if name_data.get('name') in batch and name_data.get('country')
+            )
+
+        # Imported names have not been requested yet, so they don't count towards popularity
+        with transaction.atomic():
+            create_name_objects(nationalize_data, request_count=0)
+        self.created += len(nationalize_data)
+        self.unresolved += len(missing) - len(nationalize_data)
+        self.stdout.write(f'{len(nationalize_data)} of {len(names)} names imported ({len(existing)} already known)')
+
+    def fetch_batch(self, names: list[str]) -> list[dict]:
+        """
+        Fetching a batch from nationalize API within the request rate, backing off while it fails
+        """
+        for attempt in range(self.retries + 1):
+            if self.rate > 0:
+                time.sleep(max(0.0, self.last_request + 1 / self.rate - time.monotonic()))
+            self.last_request = time.monotonic()
+
+            nationalize_data = parse_names_data(names)
+            if nationalize_data is not None:
+                return nationalize_data
+            if attempt < self.retries:
+                delay = min(2 ** attempt, 60)
+                logger.warning(f'Nationalize API batch failed, retrying in {delay}s')
+                time.sleep(delay)
+        raise CommandError(
+            f'Nationalize API keeps failing, stopped; run the command again to resume from {self.checkpoint_path}'
+        )
+
+    def save_checkpoint(self, position: int) -> None:
+        # Written to a temporary file first, so an interruption never leaves a partial checkpoint
+        temporary_path = self.checkpoint_path.with_name(f'{self.checkpoint_path.name}.tmp')
+        temporary_path.write_text(json.dumps({'position': position}))
+        os.replace(temporary_path, self.checkpoint_path)
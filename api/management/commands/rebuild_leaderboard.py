@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the per-country popular names leaderboard from name probabilities and request counts. '
+        'The leaderboard is maintained incrementally, so this is only needed after bulk imports or repairs.'
+    )
+
+    def handle(self, *args, **options):
+        total = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(f'Leaderboard rebuilt with {total} rows'))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.leaderboard import rollup_requests
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacts the hourly name request buckets and rebuilds the popular names leaderboards of the recent '
+        'windows (day, week, month) from them. Run it periodically, e.g. every 10 minutes from cron: windowed '
+        'rankings are as fresh as its last run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback-hours',
+            type=int,
+            default=24,
+            help='Past hours whose buckets are merged into one row per name (default 24).',
+        )
+
+    def handle(self, *args, **options):
+        result = rollup_requests(timezone.now(), timedelta(hours=options['lookback_hours']))
+        ranks = ', '.join(f'{window} {total}' for window, total in result['ranks'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["merged"]} bucket rows merged, {result["expired"]} expired; window ranks: {ranks}'
+        ))
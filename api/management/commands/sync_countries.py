@@ -0,0 +1,85 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import country_cache
+from api.models import Country
+from api.views import build_country_data, parse_country_catalogue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads the whole country catalogue from restcountries API (or from a JSON snapshot '
+        'when the API is unavailable) and upserts every Country. Safe to run on a schedule. '
+        'No snapshot is shipped; create one with --save-snapshot while the API is reachable.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--snapshot',
+            type=Path,
+            default=settings.COUNTRY_SNAPSHOT_PATH,
+            help='JSON snapshot of raw restcountries records used as a fallback.',
+        )
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Load the catalogue from the snapshot without calling the API. '
+                 'The snapshot must have been created with --save-snapshot first.',
+        )
+        parser.add_argument(
+            '--save-snapshot',
+            action='store_true',
+            help='Write the catalogue fetched from the API to the snapshot path.',
+        )
+
+    @staticmethod
+    def load_snapshot(snapshot_path: Path, offline: bool) -> list[dict]:
+        reason = 'Loading countries offline' if offline else 'Country catalogue API is unavailable'
+        if not snapshot_path.exists():
+            raise CommandError(
+                f'{reason} and there is no snapshot at {snapshot_path}. Create it with '
+                f'`manage.py sync_countries --save-snapshot` while restcountries API is reachable'
+            )
+        try:
+            return json.loads(snapshot_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read country snapshot {snapshot_path}: {e}') from e
+
+    def handle(self, *args, **options):
+        snapshot_path = options['snapshot']
+
+        catalogue = None if options['offline'] else parse_country_catalogue()
+        if catalogue is None:
+            self.stdout.write(f'Loading country catalogue from {snapshot_path}')
+            catalogue = self.load_snapshot(snapshot_path, options['offline'])
+        elif options['save_snapshot']:
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            snapshot_path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(f'Country catalogue saved to {snapshot_path}')
+
+        countries = []
+        for raw_data in catalogue:
+            try:
+                countries.append(Country(**build_country_data(raw_data)))
+            except (KeyError, TypeError, IndexError) as e:
+                logger.error(f"Error parsing catalogue record {raw_data.get('cca2')}: {e}")
+
+        update_fields = [field.name for field in Country._meta.concrete_fields if not field.primary_key]
+        Country.objects.bulk_create(
+            countries,
+            update_conflicts=True,
+            unique_fields=['code'],
+            update_fields=update_fields,
+        )
+        # bulk_create does not send post_save, so the cache is dropped explicitly; running workers
+        # see the bumped cache version and reload
+        country_cache.invalidate()
+
+        logger.info(f'{len(countries)} country objects were synchronized successfully')
+        self.stdout.write(self.style.SUCCESS(f'{len(countries)} countries synchronized'))
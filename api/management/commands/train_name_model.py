@@ -0,0 +1,55 @@
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.estimator import build_name_model
+from api.models import NameCountryProbability
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds the local name model that estimates predictions for unknown names while nationalize API fails, '
+        'from the character n-grams of all stored names and their country probabilities. The model file is '
+        'replaced atomically and running workers map the new one within seconds, without a restart.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='Model file, NAME_MODEL_PATH by default.',
+        )
+        parser.add_argument('--min-n', type=int, default=2, help='Shortest n-gram (default 2).')
+        parser.add_argument('--max-n', type=int, default=4, help='Longest n-gram (default 4).')
+        parser.add_argument(
+            '--top-countries',
+            type=int,
+            default=8,
+            help='Countries kept per n-gram (default 8).',
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options['min_n'] <= options['max_n']:
+            raise CommandError('--min-n must be at least 1 and not above --max-n')
+        path = options['output'] or settings.NAME_MODEL_PATH
+
+        # Probabilities are streamed in name order and grouped per name
+        rows = NameCountryProbability.objects.order_by('name_id').values_list(
+            'name_id', 'country_id', 'probability'
+        ).iterator(chunk_size=5000)
+        predictions = (
+            (name, {country_code: probability for _, country_code, probability in group})
+            for name, group in groupby(rows, key=itemgetter(0))
+        )
+        stats = build_name_model(
+            predictions, path, options['min_n'], options['max_n'], options['top_countries']
+        )
+        if not stats['names']:
+            self.stdout.write(self.style.WARNING('No stored predictions, the model is empty'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Name model built from {stats["names"]} names: {stats["grams"]} n-grams, '
+            f'{stats["countries"]} countries, written to {path}'
+        ))
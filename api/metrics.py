@@ -0,0 +1,149 @@
+import hmac
+import ipaddress
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'namebase_request_duration_seconds', 'Request handling time', ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'namebase_request_db_queries', 'Database queries per request', ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_TIME = Histogram(
+    'namebase_request_db_duration_seconds', 'Database time per request', ['view'],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    'namebase_upstream_duration_seconds', 'Upstream API call time, retries included', ['upstream', 'outcome'],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTIONS_WRITE_TIME = Histogram(
+    'namebase_predictions_write_duration_seconds', 'Time spent storing the predictions of a name',
+    buckets=LATENCY_BUCKETS,
+)
+SERIALIZATION_TIME = Histogram(
+    'namebase_serialization_duration_seconds', 'Response serialization time', ['view'],
+    buckets=LATENCY_BUCKETS,
+)
+# hit: cached response, miss: fresh name read from database, stale: stale name read from database,
+# cold: name fetched from nationalize API, negative: name without nationalize data answered from negative cache
+NAME_LOOKUPS = Counter('namebase_name_lookups', 'Name-stats lookups by outcome', ['outcome'])
+NAME_ESTIMATES = Counter(
+    'namebase_name_estimates', 'Names nationalize API failed for answered by the local name model', ['view']
+)
+
+
+class RequestTimings:
+    """
+    Durations and database queries accumulated while handling a single request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.db_queries = 0
+
+    def add(self, name: str, duration: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Rendering the timings as a Server-Timing header value
+        """
+        metrics = []
+        for name, duration in self.durations.items():
+            description = f';desc="{self.db_queries} queries"' if name == 'db' else ''
+            metrics.append(f'{name};dur={duration * 1000:.2f}{description}')
+        metrics.append(f'total;dur={self.total() * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+# Copied into sync_to_async threads by asgiref, so database work of async views is attributed too
+current_timings = ContextVar('current_timings', default=None)
+
+
+def record(name: str, duration: float, histogram=None, **labels) -> None:
+    """
+    Recording a duration into the histogram and the Server-Timing entry `name` of the current request
+    """
+    if histogram is not None:
+        (histogram.labels(**labels) if labels else histogram).observe(duration)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(name, duration)
+
+
+@contextmanager
+def timed(name: str, histogram=None, **labels):
+    """
+    Timing a block (or, as a decorator, a function) with `record`
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started, histogram, **labels)
+
+
+def track_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries and their time for the current request
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.add('db', time.perf_counter() - started)
+
+
+def metrics_allowed(request) -> bool:
+    """
+    Whether the client may read metrics: it connects from METRICS_ALLOWED_IPS or sends METRICS_TOKEN
+    as a bearer token. The address is the direct peer, so behind a proxy only the token works
+    """
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    """
+    Exposing the metrics in Prometheus text format, merged across worker processes
+    when PROMETHEUS_MULTIPROC_DIR is set
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+    return HttpResponse(generate_latest(), content_type=CONTENT_TYPE_LATEST)
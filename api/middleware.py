@@ -0,0 +1,88 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import (
+    DB_QUERIES,
+    DB_TIME,
+    REQUEST_LATENCY,
+    RequestTimings,
+    current_timings,
+)
+from .routers import primary_pinned
+
+
+class MetricsMiddleware:
+    """
+    Recording request latency, database queries and database time per view, and
+    reporting the timings of the request in a Server-Timing header.
+    Works under both WSGI and ASGI without switching the request between threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings: RequestTimings):
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(timings.total())
+        DB_QUERIES.labels(view).observe(timings.db_queries)
+        DB_TIME.labels(view).observe(timings.durations.get('db', 0.0))
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+
+class PrimaryPinningMiddleware:
+    """
+    Scoping read routing to the request: requests that change data read from the primary throughout,
+    others read from replicas until they write, and nothing carries over to the next request of the thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = primary_pinned.set(request.method not in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            primary_pinned.reset(token)
+
+    async def __acall__(self, request):
+        token = primary_pinned.set(request.method not in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            primary_pinned.reset(token)
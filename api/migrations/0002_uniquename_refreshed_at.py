@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:15
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_refreshed_at(apps, schema_editor):
+    """
+    Names were refreshed when requested a day after their last access, so that is
+    when their stored data was last fetched, not the time of this migration
+    """
+    UniqueName = apps.get_model('api', 'UniqueName')
+    UniqueName.objects.update(refreshed_at=F('last_accessed_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uniquename',
+            name='refreshed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_refreshed_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='country',
+            name='capital_name',
+            field=models.CharField(blank=True, max_length=256),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='flag_alt_text',
+            field=models.CharField(blank=True, max_length=2000, null=True),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='name_common',
+            field=models.CharField(max_length=256),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='name_official',
+            field=models.CharField(max_length=512),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='region',
+            field=models.CharField(blank=True, max_length=256),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_uniquename_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='namecountryprobability',
+            index=models.Index(fields=['country', 'name'], name='probability_country_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uniquename',
+            index=models.Index(fields=['-request_count', 'name'], name='uniquename_popularity_idx'),
+        ),
+    ]
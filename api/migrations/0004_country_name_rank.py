@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_leaderboard(apps, schema_editor):
+    NameCountryProbability = apps.get_model('api', 'NameCountryProbability')
+    CountryNameRank = apps.get_model('api', 'CountryNameRank')
+    rows = NameCountryProbability.objects.values_list('name_id', 'country_id', 'probability', 'name__request_count')
+    CountryNameRank.objects.bulk_create(
+        (
+            CountryNameRank(
+                name_id=name,
+                country_id=country_code,
+                probability=probability,
+                request_count=request_count,
+                weighted_score=request_count * probability,
+            )
+            for name, country_code, probability, request_count in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_popular_names_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryNameRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('probability', models.FloatField()),
+                ('request_count', models.IntegerField(default=1)),
+                ('weighted_score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='uniquename',
+            name='uniquename_popularity_idx',
+        ),
+        migrations.AddField(
+            model_name='countrynamerank',
+            name='country',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_ranks', to='api.country'),
+        ),
+        migrations.AddField(
+            model_name='countrynamerank',
+            name='name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='country_ranks', to='api.uniquename'),
+        ),
+        migrations.AddIndex(
+            model_name='countrynamerank',
+            index=models.Index(fields=['country', '-request_count', 'name'], name='rank_country_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='countrynamerank',
+            index=models.Index(fields=['country', '-weighted_score', 'name'], name='rank_country_weighted_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='countrynamerank',
+            unique_together={('country', 'name')},
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+import logging
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Max, Sum
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name):
+    # Frozen copy of api.names.normalize_name, so later changes to it don't alter this migration
+    name = unicodedata.normalize('NFKC', name).casefold()
+    return ' '.join(unicodedata.normalize('NFKC', name).split())
+
+
+def merge_duplicate_names(apps, schema_editor):
+    UniqueName = apps.get_model('api', 'UniqueName')
+    NameCountryProbability = apps.get_model('api', 'NameCountryProbability')
+    CountryNameRank = apps.get_model('api', 'CountryNameRank')
+    max_length = UniqueName._meta.get_field('name').max_length
+
+    groups = defaultdict(list)
+    invalid_names = []
+    for name in UniqueName.objects.values_list('name', flat=True).iterator(chunk_size=5000):
+        key = normalize_name(name)
+        if not key or len(key) > max_length:
+            invalid_names.append(name)
+        elif key != name:
+            groups[key].append(name)
+
+    # Names without a valid canonical key can't be requested any more, but would still rank
+    # in leaderboards; probabilities and leaderboard rows go with them
+    for start in range(0, len(invalid_names), 1000):
+        UniqueName.objects.filter(name__in=invalid_names[start:start + 1000]).delete()
+    if invalid_names or groups:
+        logger.warning(
+            f'{len(invalid_names)} names without a valid normalized form were deleted, '
+            f'{sum(len(names) for names in groups.values())} spellings were merged into {len(groups)} names'
+        )
+
+    for key, names in groups.items():
+        members = UniqueName.objects.filter(name__in=[key, *names])
+        totals = members.aggregate(
+            request_count=Sum('request_count'),
+            refreshed_at=Max('refreshed_at'),
+            last_accessed_at=Max('last_accessed_at'),
+        )
+        # The most recently refreshed spelling holds the predictions kept for the canonical name
+        source = members.order_by('-refreshed_at', 'name').values_list('name', flat=True).first()
+
+        UniqueName.objects.get_or_create(name=key, defaults={'request_count': 0})
+        # update() leaves last_accessed_at alone, unlike save() with auto_now
+        UniqueName.objects.filter(name=key).update(**totals)
+
+        if source != key:
+            NameCountryProbability.objects.filter(name_id=key).delete()
+            NameCountryProbability.objects.bulk_create(
+                NameCountryProbability(name_id=key, country_id=country_code, probability=probability)
+                for country_code, probability in NameCountryProbability.objects.filter(
+                    name_id=source
+                ).values_list('country_id', 'probability')
+            )
+        # Probabilities and leaderboard rows of the merged spellings go with them
+        UniqueName.objects.filter(name__in=names).delete()
+
+        CountryNameRank.objects.filter(name_id=key).delete()
+        CountryNameRank.objects.bulk_create(
+            CountryNameRank(
+                name_id=key,
+                country_id=country_code,
+                probability=probability,
+                request_count=totals['request_count'],
+                weighted_score=totals['request_count'] * probability,
+            )
+            for country_code, probability in NameCountryProbability.objects.filter(
+                name_id=key
+            ).values_list('country_id', 'probability')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_country_name_rank'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
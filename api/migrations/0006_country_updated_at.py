@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_normalize_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='country',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
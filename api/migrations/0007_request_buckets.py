@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-17 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_country_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryNameWindowRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=16)),
+                ('request_count', models.IntegerField()),
+                ('weighted_score', models.FloatField()),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_window_ranks', to='api.country')),
+                ('name', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='country_window_ranks', to='api.uniquename')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', 'country', '-request_count', 'name'], name='window_rank_count_idx'), models.Index(fields=['window', 'country', '-weighted_score', 'name'], name='window_rank_weighted_idx')],
+                'unique_together': {('window', 'country', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='NameRequestBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('request_count', models.IntegerField()),
+                ('name', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='request_buckets', to='api.uniquename')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'name'], name='bucket_hour_name_idx')],
+            },
+        ),
+    ]
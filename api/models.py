@@ -1,10 +1,12 @@
 from django.db import models
+from django.utils import timezone
 
 
 class UniqueName(models.Model):
     name = models.CharField(primary_key=True, max_length=64)
     request_count = models.IntegerField(default=1)
     last_accessed_at = models.DateTimeField(auto_now=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)
     associated_countries = models.ManyToManyField('Country', through='NameCountryProbability')
 
     def __str__(self):
@@ -41,6 +43,9 @@ class Country(models.Model):
     #borders
     borders = models.JSONField(default=list, blank=True)
 
+    # Last-Modified of the countries endpoint
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name_common
 
@@ -52,8 +57,83 @@ class NameCountryProbability(models.Model):
 
     class Meta:
         unique_together = ('name', 'country')
+        indexes = [
+            models.Index(fields=['country', 'name'], name='probability_country_name_idx'),
+        ]
         verbose_name = "Name-Country probability"
         verbose_name_plural = "Name-Country probabilities"
 
     def __str__(self):
         return f"{self.name.name} - {self.country.name_common}, Probability: {self.probability}"
+
+
+class CountryNameRank(models.Model):
+    """
+    Denormalized per-country popularity of names, read by the popular names endpoint.
+    Kept in sync when request counts are flushed and when name probabilities change.
+    """
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name="name_ranks")
+    name = models.ForeignKey(UniqueName, on_delete=models.CASCADE, related_name="country_ranks")
+    probability = models.FloatField()
+    request_count = models.IntegerField(default=1)
+    # request_count * probability
+    weighted_score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('country', 'name')
+        indexes = [
+            models.Index(fields=['country', '-request_count', 'name'], name='rank_country_count_idx'),
+            models.Index(fields=['country', '-weighted_score', 'name'], name='rank_country_weighted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.country_id} - {self.name_id}: {self.request_count}"
+
+
+class NameRequestBucket(models.Model):
+    """
+    Requests for a name within an hour, appended by every request count flush.
+    The rollup job merges the rows of an hour into one and drops hours older than the longest window.
+    Names are neither constrained nor indexed on their own, keeping appends cheap; rows of deleted
+    names are left to expire
+    """
+    name = models.ForeignKey(
+        UniqueName,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="request_buckets",
+    )
+    hour = models.DateTimeField()
+    request_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hour', 'name'], name='bucket_hour_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name_id} {self.hour:%Y-%m-%d %H}:00: {self.request_count}"
+
+
+class CountryNameWindowRank(models.Model):
+    """
+    Per-country popularity of names over a recent window of POPULAR_NAMES_WINDOWS,
+    rebuilt from request buckets by the rollup job and read by the popular names endpoint
+    """
+    window = models.CharField(max_length=16)
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name="name_window_ranks")
+    name = models.ForeignKey(UniqueName, on_delete=models.CASCADE, related_name="country_window_ranks")
+    request_count = models.IntegerField()
+    # request_count * probability
+    weighted_score = models.FloatField()
+
+    class Meta:
+        unique_together = ('window', 'country', 'name')
+        indexes = [
+            models.Index(fields=['window', 'country', '-request_count', 'name'], name='window_rank_count_idx'),
+            models.Index(fields=['window', 'country', '-weighted_score', 'name'], name='window_rank_weighted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} {self.country_id} - {self.name_id}: {self.request_count}"
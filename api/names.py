@@ -0,0 +1,11 @@
+import unicodedata
+
+
+def normalize_name(name: str) -> str:
+    """
+    Canonical key of a name: NFKC-normalized, case-folded, with whitespace trimmed and collapsed,
+    so "Andrew", "andrew" and " ANDREW " are looked up, cached and counted as one name
+    """
+    name = unicodedata.normalize('NFKC', name).casefold()
+    # Case folding can produce characters that are not NFKC-normalized again (e.g. from "ẞ")
+    return ' '.join(unicodedata.normalize('NFKC', name).split())
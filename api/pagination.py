@@ -0,0 +1,32 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(score: float, name: str) -> str:
+    """
+    Encoding the position after a (score, name) row as an opaque cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps([score, name]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        score, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+    if isinstance(score, bool) or not isinstance(score, int | float) or not isinstance(name, str):
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+    return score, name
+
+
+def after_cursor(score_field: str, name_field: str, score: float, name: str) -> Q:
+    """
+    Filter for rows following (score, name) in `-score_field, name_field` order
+    """
+    return Q(**{f'{score_field}__lt': score}) | Q(**{score_field: score, f'{name_field}__gt': name})
@@ -0,0 +1,18 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson, several times faster than the standard library encoder.
+    Types orjson does not know (lazy strings, decimals, ...) are left to DRF's encoder
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # orjson only supports two-space indentation, used whenever the client asks for any
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(data, default=JSONEncoder().default, option=option)
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Whether reads of the current request or task go to the primary. Set by the first write and
+# for names written within the replication lag, reset per request by PrimaryPinningMiddleware
+primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+def pin_primary() -> None:
+    """
+    Reading from the primary for the rest of the current request or task
+    """
+    primary_pinned.set(True)
+
+
+@contextmanager
+def use_primary():
+    """
+    Reading from the primary within the block
+    """
+    token = primary_pinned.set(True)
+    try:
+        yield
+    finally:
+        primary_pinned.reset(token)
+
+
+def written_name_cache_key(name: str) -> str:
+    return f'db:written:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def mark_names_written(names: list[str]) -> None:
+    """
+    Remembering names just written to the primary for DB_REPLICA_STICKY_SECONDS,
+    while replicas may not have their new data yet
+    """
+    if settings.DATABASE_REPLICAS and settings.DB_REPLICA_STICKY_SECONDS > 0:
+        caches[settings.NAME_RESPONSE_CACHE].set_many(
+            {written_name_cache_key(name): True for name in names},
+            timeout=settings.DB_REPLICA_STICKY_SECONDS,
+        )
+
+
+def pin_primary_if_written(name: str) -> None:
+    """
+    Reading from the primary for the rest of the request if the name was written recently,
+    so a response cached from its data is never built from a lagging replica
+    """
+    if settings.DATABASE_REPLICAS and caches[settings.NAME_RESPONSE_CACHE].get(written_name_cache_key(name)):
+        pin_primary()
+
+
+async def apin_primary_if_written(name: str) -> None:
+    if settings.DATABASE_REPLICAS and await caches[settings.NAME_RESPONSE_CACHE].aget(written_name_cache_key(name)):
+        pin_primary()
+
+
+class PrimaryReplicaRouter:
+    """
+    Sending writes to the primary and reads to a random healthy replica of DATABASE_REPLICAS.
+
+    Reads go to the primary instead once the request has written (read-your-writes),
+    inside transactions, when pinned, and when no replica is reachable. A replica that
+    fails to connect is skipped for DB_REPLICA_RETRY_INTERVAL seconds
+    """
+
+    def __init__(self):
+        self._down_until = {}
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if primary_pinned.get() or connections['default'].in_atomic_block:
+            return 'default'
+
+        now = time.monotonic()
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if self._down_until.get(alias, 0) <= now]
+        random.shuffle(replicas)
+        for alias in replicas:
+            if self._is_healthy(alias):
+                return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+    def _is_healthy(self, alias: str) -> bool:
+        """
+        Connecting to the replica if not connected yet. The persistent connection is checked
+        once per request (CONN_HEALTH_CHECKS) and replaced here if it was dropped
+        """
+        connection = connections[alias]
+        try:
+            connection.close_if_health_check_failed()
+            connection.ensure_connection()
+        except DatabaseError as e:
+            logger.warning(f'Database replica {alias} is unavailable, reading from primary: {e}')
+            self._down_until[alias] = time.monotonic() + settings.DB_REPLICA_RETRY_INTERVAL
+            return False
+        return True
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+# OpenAPI annotations of the API. API-only workers never generate the schema, so they get
+# no-op stand-ins instead of importing drf-spectacular; the full profile generates it on request
+if settings.API_ONLY:
+    class OpenApiTypes:
+        STR = INT = OBJECT = None
+
+    class OpenApiParameter:
+        QUERY = 'query'
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+    def extend_schema(*args, **kwargs):
+        return lambda target: target
+
+    def extend_schema_field(*args, **kwargs):
+        return lambda target: target
+else:
+    from drf_spectacular.types import OpenApiTypes  # noqa: F401
+    from drf_spectacular.utils import (  # noqa: F401
+        OpenApiParameter,
+        extend_schema,
+        extend_schema_field,
+    )
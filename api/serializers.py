@@ -1,6 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from .cache import country_cache
 from .models import Country, NameCountryProbability, UniqueName
+from .names import normalize_name
+from .schema import extend_schema_field
 
 
 class UniqueNameSerializer(serializers.ModelSerializer):
@@ -12,11 +16,26 @@ class UniqueNameSerializer(serializers.ModelSerializer):
 class CountrySerializer(serializers.ModelSerializer):
     class Meta:
         model = Country
-        fields = '__all__'
+        # Served as the Last-Modified header of the countries endpoint instead
+        exclude = ['updated_at']
+
+
+@extend_schema_field(CountrySerializer)
+class CachedCountryField(serializers.Field):
+    """
+    Country representation taken from the process-level country cache by country code
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return country_cache.get(value)
 
 
 class NameCountryProbabilitySerializer(serializers.ModelSerializer):
-    country = CountrySerializer(read_only=True)
+    country = CachedCountryField(source='country_id')
 
     class Meta:
         model = NameCountryProbability
@@ -27,8 +46,30 @@ class FinalAnswerSerializer(serializers.Serializer):
     name = serializers.CharField()
     requests_count = serializers.IntegerField()
     country_predictions = NameCountryProbabilitySerializer(many=True)
+    # Predicted by the local name model while nationalize API fails, neither stored nor counted
+    estimated = serializers.BooleanField(default=False)
 
 
 class PopularNameSerializer(serializers.Serializer):
     name = serializers.CharField()
     frequency = serializers.FloatField()
+
+
+class NameField(serializers.CharField):
+    """
+    Name normalized to its canonical key, the length limit applies to the normalized name
+    """
+
+    def to_internal_value(self, data):
+        name = normalize_name(super().to_internal_value(data))
+        if not name:
+            self.fail('blank')
+        return name
+
+
+class NameBatchSerializer(serializers.Serializer):
+    names = serializers.ListField(
+        child=NameField(max_length=64),
+        allow_empty=False,
+        max_length=settings.NAME_BATCH_MAX_NAMES,
+    )
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache_key
+from .cache import country_cache
+from .metrics import track_query
+from .models import Country
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_country_cache(sender, instance, **kwargs):
+    country_cache.invalidate(instance.code)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Cached tokens carry their user, e.g. a deactivated one
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+@receiver(connection_created)
+def track_connection_queries(sender, connection, **kwargs):
+    # Sent again whenever the connection of a thread is reopened
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescing concurrent calls with the same key within the process.
+
+    The first caller runs the function; callers arriving while it is in flight wait for it
+    and get the same result (or exception) instead of running the function again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn, *args, **kwargs) -> tuple:
+        """
+        Running `fn` once per key at a time, returns (result, shared) where `shared`
+        tells whether the result came from a call started by another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight: callers arriving while a coroutine for the
+    key is in flight on the same event loop await its result instead of running it again.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key: str, fn, *args, **kwargs) -> tuple:
+        """
+        Awaiting `fn` once per key at a time, returns (result, shared)
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            # Shielded so that a cancelled waiter does not cancel the call for everyone else
+            return await asyncio.shield(future), True
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            # Marks the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del calls[key]
+        return result, False
+
+
+class FetchLease:
+    """
+    Cross-process lease on fetching a key from upstream, kept in the shared name cache.
+
+    The first process takes the lease and fetches; others wait until it is released or expires
+    (FETCH_LEASE_TIMEOUT) and then look for the stored result, without holding a database
+    connection or lock while upstream answers. An expired lease only means a duplicate fetch
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def _cache_key(self, key: str) -> str:
+        return f'lease:{self.kind}:{hashlib.md5(key.encode()).hexdigest()}'
+
+    @contextmanager
+    def hold(self, key: str):
+        """
+        Yielding True while holding the lease for the key, or False once another holder is done with it
+        """
+        cache = caches[settings.NAME_RESPONSE_CACHE]
+        cache_key, token = self._cache_key(key), uuid.uuid4().hex
+        if not cache.add(cache_key, token, timeout=settings.FETCH_LEASE_TIMEOUT):
+            deadline = time.monotonic() + settings.FETCH_LEASE_TIMEOUT
+            while cache.get(cache_key) is not None and time.monotonic() < deadline:
+                time.sleep(self.POLL_INTERVAL)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if cache.get(cache_key) == token:
+                cache.delete(cache_key)
+
+    @asynccontextmanager
+    async def ahold(self, key: str):
+        cache = caches[settings.NAME_RESPONSE_CACHE]
+        cache_key, token = self._cache_key(key), uuid.uuid4().hex
+        if not await cache.aadd(cache_key, token, timeout=settings.FETCH_LEASE_TIMEOUT):
+            deadline = time.monotonic() + settings.FETCH_LEASE_TIMEOUT
+            while await cache.aget(cache_key) is not None and time.monotonic() < deadline:
+                await asyncio.sleep(self.POLL_INTERVAL)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if await cache.aget(cache_key) == token:
+                await cache.adelete(cache_key)
+
+
+def advisory_lock_id(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@contextmanager
+def advisory_lock(key: str):
+    """
+    Holding a PostgreSQL session-level advisory lock for the key, serializing the block
+    across processes. It pins a database connection, so the block must only do database work.
+    Other databases don't support it, so there the block runs unlocked.
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+
+    lock_id = advisory_lock_id(key)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+
+
+name_flight = SingleFlight()
+async_name_flight = AsyncSingleFlight()
+name_fetch_lease = FetchLease('name')
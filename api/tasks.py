@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import UniqueName
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_name(name: str) -> bool:
+    """
+    Refreshing name probabilities from nationalize API
+    """
+    # Imported here as views enqueue refreshes themselves
+    from .views import create_or_update_country_and_probability_objects, parse_name_data
+
+    name_object = UniqueName.objects.filter(name=name).first()
+    if not name_object:
+        logger.error(f'Name object with name {name} does not exist, refresh skipped')
+        return False
+
+    nationalize_data = parse_name_data(name)
+    if not nationalize_data:
+        logger.error(f'Nationalize API error while refreshing {name}')
+        return False
+
+    create_or_update_country_and_probability_objects(name_object, nationalize_data)
+    logger.info(f'Name object with name {name} was refreshed successfully')
+    return True
+
+
+class NameRefresher:
+    """
+    Background refresh of stale names on a local thread pool.
+
+    A name is queued at most once at a time, so repeated requests for the same stale
+    name don't multiply upstream calls. No external broker is needed; queued refreshes
+    are lost on restart and simply requeued by the next request for a stale name.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def enqueue(self, name: str) -> bool:
+        """
+        Queueing a name refresh, returns False if it is already queued
+        """
+        with self._lock:
+            # Executor threads do not survive a fork, so every worker process starts its own pool
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.NAME_REFRESH_WORKERS,
+                    thread_name_prefix='name-refresh',
+                )
+                self._pid = os.getpid()
+                self._in_flight = set()
+            if name in self._in_flight:
+                return False
+            self._in_flight.add(name)
+
+        self._executor.submit(self._run, name)
+        return True
+
+    def in_flight(self) -> int:
+        """
+        Getting the number of queued or running refreshes
+        """
+        with self._lock:
+            return len(self._in_flight)
+
+    def _run(self, name: str) -> None:
+        close_old_connections()
+        try:
+            # The name is rewritten from what the primary has; pinning ends with the task
+            with use_primary():
+                refresh_name(name)
+        except Exception:
+            logger.exception(f'Unexpected error while refreshing {name}')
+        finally:
+            with self._lock:
+                self._in_flight.discard(name)
+            close_old_connections()
+
+
+name_refresher = NameRefresher()
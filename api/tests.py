@@ -1,10 +1,1574 @@
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from prometheus_client import REGISTRY
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from namebase.log_handlers import QueuedRotatingFileHandler
+
+from .async_views import AsyncNameStatsView
+from .cache import (
+    CountryCache,
+    NegativeCache,
+    country_cache,
+    country_negative_cache,
+    get_cached_name_response,
+)
+from .counters import request_counter
+from .estimator import NameModel, build_name_model
+from .leaderboard import (
+    bucket_hour,
+    rebuild_leaderboard,
+    rollup_requests,
+    update_name_ranks,
+)
+from .middleware import PrimaryPinningMiddleware
+from .models import (
+    Country,
+    CountryNameRank,
+    CountryNameWindowRank,
+    NameCountryProbability,
+    NameRequestBucket,
+    UniqueName,
+)
+from .names import normalize_name
+from .renderers import ORJSONRenderer
+from .routers import (
+    PrimaryReplicaRouter,
+    mark_names_written,
+    pin_primary_if_written,
+    primary_pinned,
+    use_primary,
+)
+from .serializers import FinalAnswerSerializer
+from .singleflight import AsyncSingleFlight, SingleFlight, name_fetch_lease
+from .tasks import NameRefresher, refresh_name
+from .throttling import SlidingWindowUserRateThrottle
+from .upstream import (
+    AsyncUpstreamClient,
+    CircuitBreaker,
+    CircuitOpenError,
+    UpstreamClient,
+)
+from .views import (
+    NameStatsBatchView,
+    aparse_name_data,
+    create_name_object,
+    create_or_update_country_and_probability_objects,
+    get_or_create_countries,
+    parse_country_data,
+    parse_name_data,
+)
+
+
+def restcountries_record(code: str) -> dict:
+    return {
+        'cca2': code, 'name': {'common': f'Country {code}', 'official': f'Country {code}'},
+        'maps': {}, 'flags': {}, 'coatOfArms': {},
+    }
+
+
+class StubUpstream:
+    """
+    Local HTTP server replaying queued (status, body) responses, for upstream client tests
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        self.delay = 0
+        self.headers = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests.append(self.path)
+                time.sleep(stub.delay)
+                code, body = stub.responses.pop(0) if stub.responses else (200, {})
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    for header, value in stub.headers.items():
+                        self.send_header(header, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up waiting (timeout tests)
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UpstreamClientTest(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubUpstream()
+        self.client_ = UpstreamClient(
+            'stub', self.stub.url, retries=2, backoff_factor=0, backoff_jitter=0, failure_threshold=2
+        )
+
+    def tearDown(self):
+        self.client_.close()
+        self.stub.stop()
+
+    def test_retries_server_errors(self):
+        self.stub.responses = [(503, {}), (200, {'name': 'andrew', 'country': []})]
+        response = self.client_.get(params={'name': 'andrew'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_retry_after_is_capped(self):
+        self.stub.responses = [(429, {}), (200, {'name': 'andrew', 'country': []})]
+        self.stub.headers = {'Retry-After': '3600'}
+        client = UpstreamClient('stub', self.stub.url, retries=1, backoff_max=0.1)
+        started = time.monotonic()
+        response = client.get()
+        client.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_circuit_opens_after_failures(self):
+        self.stub.responses = [(500, {})] * 6
+        self.client_.get()
+        self.client_.get()
+        with self.assertRaises(CircuitOpenError):
+            self.client_.get()
+        self.assertEqual(len(self.stub.requests), 6)
+
+    def test_read_timeout(self):
+        self.stub.delay = 0.5
+        client = UpstreamClient('stub', self.stub.url, read_timeout=0.1, retries=0)
+        with self.assertRaises(requests.exceptions.RequestException):
+            client.get()
+        client.close()
+
+    def test_parse_functions_use_clients(self):
+        self.stub.responses = [(200, {'name': 'andrew', 'country': []}), (200, [restcountries_record('GB')])]
+        with (
+            mock.patch('api.views.nationalize_client', self.client_),
+            mock.patch('api.views.restcountries_client', self.client_),
+        ):
+            self.assertEqual(parse_name_data('andrew'), {'name': 'andrew', 'country': []})
+            self.assertEqual(parse_country_data('GB')['name_common'], 'Country GB')
+        self.assertEqual(self.stub.requests, ['/?name=andrew', '/alpha/GB'])
+
+
+class AsyncUpstreamClientTest(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubUpstream()
+        self.client_ = AsyncUpstreamClient(
+            'stub', self.stub.url, CircuitBreaker('stub', failure_threshold=2),
+            retries=2, backoff_factor=0, backoff_jitter=0,
+        )
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def get(self, *args, **kwargs):
+        async def get():
+            try:
+                return await self.client_.get(*args, **kwargs)
+            finally:
+                await self.client_.close()
+        return async_to_sync(get)()
+
+    def test_retries_server_errors(self):
+        self.stub.responses = [(503, {}), (200, {'name': 'andrew', 'country': []})]
+        response = self.get(params={'name': 'andrew'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stub.requests, ['/?name=andrew'] * 2)
+
+    def test_retry_after_is_capped(self):
+        self.stub.responses = [(429, {}), (200, {'name': 'andrew', 'country': []})]
+        self.stub.headers = {'Retry-After': '3600'}
+        client = UpstreamClient('stub', self.stub.url, retries=1, backoff_max=0.1)
+        started = time.monotonic()
+        response = client.get()
+        client.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_circuit_opens_after_failures(self):
+        self.stub.responses = [(500, {})] * 6
+        self.get()
+        self.get()
+        with self.assertRaises(CircuitOpenError):
+            self.get()
+        self.assertEqual(len(self.stub.requests), 6)
+
+    def test_cancelled_trial_reopens_circuit(self):
+        breaker = self.client_.breaker
+        breaker.reset_timeout = 0.05
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.stub.delay = 0.5
+
+        async def cancelled_trial():
+            task = asyncio.ensure_future(self.client_.get())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            await self.client_.close()
+
+        async_to_sync(cancelled_trial)()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.stub.delay = 0
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_lost_trial_expires(self):
+        breaker = CircuitBreaker('stub', failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.before_request()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        # The trial never reported back: the circuit opens again, then lets a new trial through
+        time.sleep(0.06)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        breaker.before_request()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_read_timeout(self):
+        self.stub.delay = 0.5
+        self.client_.timeout = httpx.Timeout(0.1)
+        self.client_.retries = 0
+        with self.assertRaises(httpx.TimeoutException):
+            self.get()
+
+    def test_parse_name_data(self):
+        self.stub.responses = [(200, {'name': 'andrew', 'country': []}), (404, {})]
+        with mock.patch('api.views.async_nationalize_client', self.client_):
+            self.assertEqual(async_to_sync(aparse_name_data)('andrew'), {'name': 'andrew', 'country': []})
+            self.assertIsNone(async_to_sync(aparse_name_data)('andrew'))
+
+
+@override_settings(COUNTRY_FETCH_ON_REQUEST=True)
+class CountryBatchTest(TestCase):
+    def setUp(self):
+        self.stub = StubUpstream()
+        self.client_ = UpstreamClient('stub', self.stub.url, retries=0)
+        self.patcher = mock.patch('api.views.restcountries_client', self.client_)
+        self.patcher.start()
+        country_cache.invalidate()
+        self.name_object = UniqueName.objects.create(name='andrew')
+        Country.objects.create(code='US', name_common='Country US', name_official='Country US')
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.client_.close()
+        self.stub.stop()
+
+    def nationalize_data(self, *codes):
+        return {'name': 'andrew', 'country': [{'country_id': code, 'probability': 0.1} for code in codes]}
+
+    def test_missing_countries_fetched_in_one_request(self):
+        self.stub.responses = [(200, [restcountries_record('GB'), restcountries_record('IE')])]
+        create_or_update_country_and_probability_objects(self.name_object, self.nationalize_data('GB', 'US', 'IE'))
+
+        self.assertEqual(self.stub.requests, ['/alpha?codes=GB%2CIE'])
+        self.assertEqual(Country.objects.count(), 3)
+        self.assertEqual(NameCountryProbability.objects.filter(name=self.name_object).count(), 3)
+
+    def test_falls_back_to_single_requests(self):
+        self.stub.responses = [(200, [restcountries_record('GB')]), (404, {})]
+        create_or_update_country_and_probability_objects(self.name_object, self.nationalize_data('GB', 'XX'))
+
+        self.assertEqual(self.stub.requests, ['/alpha?codes=GB%2CXX', '/alpha/XX'])
+        self.assertEqual(set(Country.objects.values_list('code', flat=True)), {'GB', 'US'})
+        self.assertEqual(NameCountryProbability.objects.filter(name=self.name_object).count(), 1)
+
+    @override_settings(COUNTRY_FETCH_ON_REQUEST=False)
+    def test_request_path_does_not_fetch_by_default(self):
+        create_or_update_country_and_probability_objects(self.name_object, self.nationalize_data('GB', 'US'))
+
+        self.assertEqual(self.stub.requests, [])
+        self.assertEqual(list(self.name_object.associated_countries.values_list('code', flat=True)), ['US'])
+
+
+class SyncCountriesCommandTest(TestCase):
+    def setUp(self):
+        self.stub = StubUpstream()
+        self.client_ = UpstreamClient('stub', self.stub.url, retries=0)
+        self.patcher = mock.patch('api.views.restcountries_client', self.client_)
+        self.patcher.start()
+        Country.objects.create(code='GB', name_common='Old name', name_official='Old name')
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.client_.close()
+        self.stub.stop()
+
+    def test_upserts_catalogue_from_api(self):
+        records = [restcountries_record('GB'), restcountries_record('US')]
+        self.stub.responses = [
+            (200, records),
+            (200, [{'cca2': 'GB', 'borders': ['IRL']}, {'cca2': 'US', 'borders': []}]),
+        ]
+        call_command('sync_countries', stdout=StringIO())
+
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(Country.objects.count(), 2)
+        country = Country.objects.get(code='GB')
+        self.assertEqual(country.name_common, 'Country GB')
+        self.assertEqual(country.borders, ['IRL'])
+
+    def test_falls_back_to_snapshot(self):
+        self.stub.responses = [(503, {})]
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Path(directory) / 'countries.json'
+            snapshot.write_text(json.dumps([restcountries_record('GB'), restcountries_record('FR')]))
+            call_command('sync_countries', snapshot=snapshot, stdout=StringIO())
+
+        self.assertEqual(set(Country.objects.values_list('code', flat=True)), {'GB', 'FR'})
+        self.assertEqual(Country.objects.get(code='GB').name_common, 'Country GB')
+
+    def test_missing_snapshot_is_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Path(directory) / 'countries.json'
+            with self.assertRaisesMessage(CommandError, '--save-snapshot'):
+                call_command('sync_countries', snapshot=snapshot, offline=True, stdout=StringIO())
+
+        self.assertEqual(len(self.stub.requests), 0)
+
+
+def nationalize_batch(names):
+    return [{'name': name, 'country': [{'country_id': 'GB', 'probability': 0.5}]} for name in names if name != 'nobody']
+
+
+@override_settings(NATIONALIZE_BATCH_SIZE=2)
+class ImportNamesCommandTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        Country.objects.create(code='GB', name_common='United Kingdom', name_official='United Kingdom')
+        UniqueName.objects.create(name='known', request_count=7)
+
+    def write(self, filename, lines):
+        path = self.directory / filename
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return path
+
+    def call(self, path, **options):
+        call_command('import_names', path, rate=0, retries=0, chunk_size=2, stdout=StringIO(), **options)
+
+    @mock.patch('api.management.commands.import_names.parse_names_data', side_effect=nationalize_batch)
+    def test_imports_jsonl_in_batches(self, parse):
+        path = self.write('names.jsonl', [
+            json.dumps({'name': name}) for name in ('andrew', 'maria', 'andrew', 'known', 'nobody', 'ivan')
+        ])
+        self.call(path)
+
+        self.assertEqual(
+            [call.args[0] for call in parse.call_args_list], [['andrew', 'maria'], ['nobody', 'ivan']]
+        )
+        self.assertEqual(set(UniqueName.objects.values_list('name', flat=True)), {'andrew', 'maria', 'ivan', 'known'})
+        self.assertEqual(UniqueName.objects.get(name='andrew').request_count, 0)
+        self.assertEqual(UniqueName.objects.get(name='known').request_count, 7)
+        self.assertEqual(NameCountryProbability.objects.filter(country_id='GB').count(), 3)
+        self.assertEqual(CountryNameRank.objects.filter(country_id='GB').count(), 3)
+        self.assertFalse((self.directory / 'names.jsonl.checkpoint').exists())
+
+    @mock.patch('api.management.commands.import_names.parse_names_data', side_effect=nationalize_batch)
+    def test_imports_csv_column(self, parse):
+        path = self.write('names.csv', ['id,name', '1,Andrew', '2,Maria'])
+        self.call(path)
+        self.assertEqual(UniqueName.objects.filter(name__in=['andrew', 'maria']).count(), 2)
+
+    def test_resumes_from_checkpoint(self):
+        path = self.write('names.jsonl', ['"Andrew"', '"Maria"', '"Ivan"', '"Olga"', '"Petr"'])
+
+        # The second chunk fails: the first one stays committed and checkpointed
+        with mock.patch(
+            'api.management.commands.import_names.parse_names_data', side_effect=[nationalize_batch(['andrew', 'maria']), None]
+        ):
+            with self.assertRaises(CommandError):
+                self.call(path)
+        checkpoint = self.directory / 'names.jsonl.checkpoint'
+        self.assertEqual(json.loads(checkpoint.read_text()), {'position': 2})
+
+        with mock.patch(
+            'api.management.commands.import_names.parse_names_data', side_effect=nationalize_batch
+        ) as parse:
+            self.call(path)
+        self.assertEqual([call.args[0] for call in parse.call_args_list], [['ivan', 'olga'], ['petr']])
+        self.assertEqual(UniqueName.objects.count(), 6)
+        self.assertFalse(checkpoint.exists())
+
+
+class CountryCacheTest(TestCase):
+    def setUp(self):
+        country_cache.invalidate()
+        self.country = Country.objects.create(code='GB', name_common='Country GB', name_official='Country GB')
+        name_object = UniqueName.objects.create(name='andrew')
+        NameCountryProbability.objects.create(name=name_object, country=self.country, probability=0.5)
+        self.final_data = {
+            'name': name_object.name,
+            'requests_count': name_object.request_count,
+            'country_predictions': list(name_object.country_probabilities.all()),
+        }
+
+    def test_serialized_country_is_cached(self):
+        with self.assertNumQueries(1):
+            data = FinalAnswerSerializer(instance=self.final_data).data
+        with self.assertNumQueries(0):
+            self.assertEqual(FinalAnswerSerializer(instance=self.final_data).data, data)
+        self.assertEqual(data['country_predictions'][0]['country']['name_common'], 'Country GB')
+
+    def test_cache_invalidated_on_save(self):
+        country_cache.get('GB')
+        self.country.name_common = 'United Kingdom'
+        self.country.save()
+
+        data = FinalAnswerSerializer(instance=self.final_data).data
+        self.assertEqual(data['country_predictions'][0]['country']['name_common'], 'United Kingdom')
+
+    @mock.patch.object(CountryCache, 'VERSION_CHECK_INTERVAL', 0)
+    def test_invalidation_reaches_other_processes(self):
+        other_process = CountryCache(ttl=3600)
+        self.assertEqual(other_process.get('GB')['name_common'], 'Country GB')
+        Country.objects.filter(code='GB').update(name_common='United Kingdom')
+        self.assertEqual(other_process.get('GB')['name_common'], 'Country GB')
+
+        country_cache.invalidate()
+        self.assertEqual(other_process.get('GB')['name_common'], 'United Kingdom')
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class NameResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        request_counter.flush()
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('name-stats')
+        Country.objects.create(code='GB', name_common='Country GB', name_official='Country GB')
+        self.nationalize_data = {'name': 'andrew', 'country': [{'country_id': 'GB', 'probability': 0.5}]}
+
+    def test_hot_name_served_from_cache(self):
+        with mock.patch('api.views.parse_name_data', return_value=self.nationalize_data) as parse:
+            first = self.client.get(self.url, {'name': 'andrew'})
+            with CaptureQueriesContext(connection) as queries:
+                second = self.client.get(self.url, {'name': 'andrew'})
+
+        parse.assert_called_once()
+        self.assertEqual(second.json(), {**first.json(), 'requests_count': 2})
+        self.assertEqual(queries.captured_queries, [])
+        request_counter.flush()
+        self.assertEqual(UniqueName.objects.get(name='andrew').request_count, 2)
+
+        # Flushed requests keep counting in cached answers
+        for _ in range(3):
+            request_counter.increment('andrew')
+        request_counter.flush()
+        with self.assertNumQueries(0):
+            third = self.client.get(self.url, {'name': 'andrew'})
+        self.assertEqual(third.json()['requests_count'], 6)
+
+    def test_cache_invalidated_when_probabilities_refresh(self):
+        with mock.patch('api.views.parse_name_data', return_value=self.nationalize_data):
+            self.client.get(self.url, {'name': 'andrew'})
+        self.assertIsNotNone(get_cached_name_response('andrew'))
+
+        create_or_update_country_and_probability_objects(UniqueName.objects.get(name='andrew'), self.nationalize_data)
+        self.assertIsNone(get_cached_name_response('andrew'))
+
+
+class NormalizeNameTest(SimpleTestCase):
+    def test_canonical_key(self):
+        self.assertEqual(normalize_name('  Andrew '), 'andrew')
+        self.assertEqual(normalize_name('ANNA  MARIA'), 'anna maria')
+        self.assertEqual(normalize_name('Straße'), 'strasse')
+        self.assertEqual(normalize_name('ＡＮＤＲＥＷ'), 'andrew')
+        self.assertEqual(normalize_name('Zoe\u0301'), 'zoé')
+        self.assertEqual(normalize_name(' \t'), '')
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class NameNormalizationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        request_counter.flush()
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        Country.objects.create(code='GB', name_common='Country GB', name_official='Country GB')
+
+    def test_spellings_share_one_name(self):
+        nationalize_data = {'name': 'andrew', 'country': [{'country_id': 'GB', 'probability': 0.5}]}
+        with mock.patch('api.views.parse_name_data', return_value=nationalize_data) as parse:
+            first = self.client.get(reverse('name-stats'), {'name': 'Andrew'})
+            second = self.client.get(reverse('name-stats'), {'name': ' ANDREW '})
+
+        parse.assert_called_once_with('andrew')
+        self.assertEqual(first.json()['name'], 'andrew')
+        self.assertEqual(second.json(), {**first.json(), 'requests_count': 2})
+        request_counter.flush()
+        self.assertEqual(list(UniqueName.objects.values_list('name', 'request_count')), [('andrew', 2)])
+
+    def test_batch_deduplicates_spellings(self):
+        nationalize_data = [{'name': 'maria', 'country': []}]
+        with mock.patch('api.views.parse_names_data', return_value=nationalize_data) as parse:
+            response = self.client.post(reverse('name-stats-batch'), {'names': ['Maria', 'MARIA ']}, format='json')
+
+        parse.assert_called_once_with(['maria'])
+        self.assertEqual(list(response.json()['results']), ['maria'])
+
+    def test_compact_predictions(self):
+        nationalize_data = {'name': 'andrew', 'country': [{'country_id': 'GB', 'probability': 0.5}]}
+        with mock.patch('api.views.parse_name_data', return_value=nationalize_data):
+            expanded = self.client.get(reverse('name-stats'), {'name': 'andrew'})
+            compact = self.client.get(reverse('name-stats'), {'name': 'andrew', 'expand': 'none'})
+            batch = self.client.post(f"{reverse('name-stats-batch')}?expand=none", {'names': ['andrew']}, format='json')
+
+        self.assertEqual(expanded.json()['country_predictions'][0]['country']['name_common'], 'Country GB')
+        self.assertEqual(compact.json()['country_predictions'], [{'probability': 0.5, 'country': 'GB'}])
+        self.assertEqual(batch.json()['results']['andrew']['country_predictions'], [{'probability': 0.5, 'country': 'GB'}])
+        invalid = self.client.get(reverse('name-stats'), {'name': 'andrew', 'expand': 'all'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_names_rejected(self):
+        self.assertEqual(self.client.get(reverse('name-stats'), {'name': '  '}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('name-stats'), {'name': 'a' * 65}).status_code, 400)
+
+
+class NormalizeNamesMigrationTest(TransactionTestCase):
+    migrate_from = [('api', '0004_country_name_rank')]
+    migrate_to = [('api', '0005_normalize_names')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_spellings_merged_and_invalid_names_deleted(self):
+        apps = self.migrate(self.migrate_from)
+        UniqueName = apps.get_model('api', 'UniqueName')
+        NameCountryProbability = apps.get_model('api', 'NameCountryProbability')
+        CountryNameRank = apps.get_model('api', 'CountryNameRank')
+        for code in ('GB', 'US', 'IE'):
+            apps.get_model('api', 'Country').objects.create(code=code, name_common=code, name_official=code)
+        now = timezone.now()
+        spellings = [
+            ('andrew', 1, now - timedelta(days=3), 'GB', 0.4),
+            ('Andrew', 2, now - timedelta(days=2), 'IE', 0.5),
+            (' ANDREW  ', 3, now - timedelta(days=1), 'US', 0.7),
+            ('   ', 5, now, 'GB', 0.9),
+        ]
+        for name, request_count, refreshed_at, country_code, probability in spellings:
+            UniqueName.objects.create(name=name, request_count=request_count, refreshed_at=refreshed_at)
+            NameCountryProbability.objects.create(name_id=name, country_id=country_code, probability=probability)
+            CountryNameRank.objects.create(
+                name_id=name, country_id=country_code, probability=probability,
+                request_count=request_count, weighted_score=request_count * probability,
+            )
+
+        with self.assertLogs('api.migrations', 'WARNING') as logs:
+            apps = self.migrate(self.migrate_to)
+        UniqueName = apps.get_model('api', 'UniqueName')
+
+        # Request counts of all spellings are summed into the canonical name
+        self.assertEqual(list(UniqueName.objects.values_list('name', 'request_count')), [('andrew', 6)])
+        # Predictions of the most recently refreshed spelling are kept
+        probabilities = apps.get_model('api', 'NameCountryProbability').objects.values_list(
+            'name_id', 'country_id', 'probability'
+        )
+        self.assertEqual(list(probabilities), [('andrew', 'US', 0.7)])
+        # The blank name is deleted with its leaderboard rows, and the leaderboard is rebuilt from the merge
+        ranks = apps.get_model('api', 'CountryNameRank').objects.values_list(
+            'name_id', 'country_id', 'request_count', 'weighted_score'
+        )
+        self.assertEqual([rank[:3] for rank in ranks], [('andrew', 'US', 6)])
+        self.assertAlmostEqual(ranks[0][3], 4.2)
+        self.assertIn('1 names without a valid normalized form were deleted', logs.output[0])
+        self.assertIn('2 spellings were merged into 1 names', logs.output[0])
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0, NEGATIVE_CACHE_TTL=60, NEGATIVE_CACHE_MAX_TTL=150)
+class NegativeCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('name-stats')
+
+    def test_failures_back_off_exponentially(self):
+        negative_cache = NegativeCache('test')
+        self.assertIsNone(negative_cache.get('xqz'))
+        retry_after = [NegativeCache.state(negative_cache.record('xqz'))['retry_after'] for _ in range(4)]
+
+        self.assertEqual(retry_after, [59, 119, 149, 149])
+        self.assertEqual(negative_cache.get('xqz')['failures'], 4)
+        with mock.patch('api.cache.time.time', return_value=time.time() + 150):
+            self.assertIsNone(negative_cache.get('xqz'))
+
+    def test_unresolved_name_is_not_requested_again(self):
+        with mock.patch('api.views.parse_name_data', return_value={'name': 'xqz', 'country': []}) as parse:
+            first = self.client.get(self.url, {'name': 'xqz'})
+            second = self.client.get(self.url, {'name': 'xqz'})
+
+        parse.assert_called_once_with('xqz')
+        self.assertEqual(first.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(second.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(second.json()['negative_cache']['failures'], 1)
+        self.assertIn(second['Retry-After'], ('59', '60'))
+        self.assertFalse(UniqueName.objects.filter(name='xqz').exists())
+
+    def test_upstream_errors_are_not_cached(self):
+        with mock.patch('api.views.parse_name_data', return_value=None) as parse:
+            responses = [self.client.get(self.url, {'name': 'xqz'}) for _ in range(2)]
+
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual([response.status_code for response in responses], [500, 500])
+        self.assertNotIn('negative_cache', responses[1].json())
+
+    @override_settings(COUNTRY_FETCH_ON_REQUEST=True)
+    def test_failed_country_is_not_requested_again(self):
+        with mock.patch('api.views.parse_countries_data', return_value=[]) as parse:
+            self.assertEqual(get_or_create_countries(['XX']), set())
+            self.assertEqual(get_or_create_countries(['XX']), set())
+
+        parse.assert_called_once_with(['XX'])
+        self.assertEqual(country_negative_cache.get('XX')['failures'], 1)
+
+
+class CountriesEndpointTest(APITestCase):
+    def setUp(self):
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        for code in ('GB', 'US'):
+            Country.objects.create(code=code, name_common=f'Country {code}', name_official=f'Country {code}')
+
+    def test_list_is_revalidated_with_etag(self):
+        response = self.client.get(reverse('countries'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([country['code'] for country in response.json()], ['GB', 'US'])
+        self.assertIn('Last-Modified', response)
+
+        not_modified = self.client.get(reverse('countries'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        not_modified = self.client.get(reverse('countries'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Country.objects.filter(code='US').update(name_common='United States')
+        country_cache.invalidate()
+        changed = self.client.get(reverse('countries'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_detail(self):
+        response = self.client.get(reverse('country', args=['gb']))
+        self.assertEqual(response.json()['name_common'], 'Country GB')
+        self.assertNotIn('updated_at', response.json())
+        not_modified = self.client.get(reverse('country', args=['GB']), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(reverse('country', args=['XX'])).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    def test_renders_like_json_renderer(self):
+        data = {'name': 'zoé', 'lazy': gettext_lazy('text'), 'amount': Decimal('1.5'), 'empty': None}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        indented = ORJSONRenderer().render([1], 'application/json; indent=4')
+        self.assertEqual(indented, b'[\n  1\n]')
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user', password='test!12354')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        Country.objects.create(code='GB', name_common='Country GB', name_official='Country GB')
+        country_cache.load()
+
+    def test_warm_request_does_not_query_database(self):
+        self.assertEqual(self.client.get(reverse('country', args=['GB'])).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('country', args=['GB']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries.captured_queries, [])
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(reverse('country', args=['GB']))
+        self.token.delete()
+        response = self.client.get(reverse('country', args=['GB']))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse('country', args=['GB']))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('country', args=['GB']))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SlidingWindowThrottleTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        SlidingWindowUserRateThrottle.previous_counts.clear()
+        self.request = mock.Mock(user=mock.Mock(pk=1, is_authenticated=True))
+        self.now = 600.0
+
+    def allow(self, view=None):
+        throttle = SlidingWindowUserRateThrottle()
+        throttle.rate = '4/min'
+        throttle.num_requests, throttle.duration = 4, 60
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, view), throttle
+
+    def test_window_slides(self):
+        self.assertEqual([self.allow()[0] for _ in range(5)], [True, True, True, True, False])
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 60)
+
+        # Halfway through the next window half of the four allowed requests still count
+        self.now += 90
+        self.assertEqual([self.allow()[0] for _ in range(3)], [True, True, False])
+        self.now += 30
+        self.assertTrue(self.allow()[0])
+
+    def test_client_above_rate_keeps_getting_rate_through(self):
+        # Five requests a minute against four a minute, evenly spaced, over several windows
+        allowed = []
+        for _ in range(20):
+            allowed.append(self.allow()[0])
+            self.now += 12
+        # Throttled requests don't count, so every window lets requests through; with the previous window
+        # weighted by its share still inside the sliding window, the evenly spaced client gets three of its five
+        self.assertEqual([sum(allowed[start:start + 5]) for start in range(0, 20, 5)], [4, 3, 3, 3])
+
+    def test_views_are_charged_their_cost(self):
+        view = mock.Mock(get_throttle_cost=lambda request: 3)
+        self.assertTrue(self.allow(view)[0])
+        self.assertTrue(self.allow()[0])
+        self.assertFalse(self.allow()[0])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], DB_REPLICA_RETRY_INTERVAL=30)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        token = primary_pinned.set(False)
+        self.addCleanup(primary_pinned.reset, token)
+        self.connections = {
+            alias: mock.Mock(in_atomic_block=False) for alias in ['default', 'replica_1', 'replica_2']
+        }
+        patcher = mock.patch('api.routers.connections', self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_replicas_until_written(self):
+        self.assertIn(self.router.db_for_read(UniqueName), ['replica_1', 'replica_2'])
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(UniqueName), 'default')
+        self.assertIn(self.router.db_for_read(UniqueName), ['replica_1', 'replica_2'])
+
+        self.assertEqual(self.router.db_for_write(UniqueName), 'default')
+        self.assertEqual(self.router.db_for_read(UniqueName), 'default')
+
+    def test_reads_in_transaction_go_to_primary(self):
+        self.connections['default'].in_atomic_block = True
+        self.assertEqual(self.router.db_for_read(UniqueName), 'default')
 
+    def test_unavailable_replica_is_skipped(self):
+        self.connections['replica_1'].ensure_connection.side_effect = OperationalError('down')
+        with mock.patch('api.routers.time.monotonic', return_value=100.0):
+            self.assertEqual({self.router.db_for_read(UniqueName) for _ in range(10)}, {'replica_2'})
+        self.assertEqual(self.connections['replica_1'].ensure_connection.call_count, 1)
 
+        self.connections['replica_2'].ensure_connection.side_effect = OperationalError('down')
+        with mock.patch('api.routers.time.monotonic', return_value=110.0):
+            self.assertEqual(self.router.db_for_read(UniqueName), 'default')
+
+        # Retried once the interval has passed
+        self.connections['replica_1'].ensure_connection.side_effect = None
+        with mock.patch('api.routers.time.monotonic', return_value=131.0):
+            self.assertEqual(self.router.db_for_read(UniqueName), 'replica_1')
+
+    def test_migrations_run_on_primary_only(self):
+        self.assertIsNone(self.router.allow_migrate('default', 'api'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api'))
+
+    def test_written_names_are_read_from_primary(self):
+        mark_names_written(['andrew'])
+        pin_primary_if_written('maria')
+        self.assertFalse(primary_pinned.get())
+        pin_primary_if_written('andrew')
+        self.assertTrue(primary_pinned.get())
+
+    def test_middleware_scopes_pinning_to_request(self):
+        seen = []
+
+        def get_response(request):
+            seen.append(self.router.db_for_read(UniqueName))
+            self.router.db_for_write(UniqueName)
+            return mock.Mock()
+
+        middleware = PrimaryPinningMiddleware(get_response)
+        middleware(APIRequestFactory().get('/'))
+        middleware(APIRequestFactory().post('/'))
+        self.assertIn(seen[0], ['replica_1', 'replica_2'])
+        self.assertEqual(seen[1], 'default')
+        self.assertFalse(primary_pinned.get())
+
+
+class QueuedRotatingFileHandlerTest(SimpleTestCase):
+    def test_records_are_written_by_background_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = QueuedRotatingFileHandler(Path(directory) / 'test.log', encoding='utf-8')
+            handler.setFormatter(logging.Formatter('{levelname} [{name}] {message}', style='{'))
+            test_logger = logging.getLogger('api.tests.queued')
+            test_logger.addHandler(handler)
+            self.addCleanup(test_logger.removeHandler, handler)
+
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                test_logger.exception('Failed %s', 'andrew')
+            handler.close()
+            text = (Path(directory) / 'test.log').read_text(encoding='utf-8')
+
+        self.assertTrue(text.startswith('ERROR [api.tests.queued] Failed andrew'))
+        self.assertIn('ValueError: boom', text)
+
+
+TRAINING_NAMES = [
+    ('andrew', {'GB': 0.6, 'US': 0.3}),
+    ('andreas', {'GR': 0.5, 'DE': 0.3}),
+    ('drew', {'US': 0.7, 'GB': 0.2}),
+    ('giovanni', {'IT': 0.9}),
+    ('giuseppe', {'IT': 0.8, 'AR': 0.1}),
+    ('giulia', {'IT': 0.7, 'CH': 0.1}),
+]
+
+
+class NameModelTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'model.bin'
+
+    def test_predicts_from_ngrams(self):
+        stats = build_name_model(iter(TRAINING_NAMES), self.path, top_countries=3)
+        self.assertEqual((stats['names'], stats['countries']), (6, 7))
+        model = NameModel()
+        self.assertTrue(model.load(self.path))
+
+        predictions = model.predict('giulio')
+        self.assertEqual(predictions[0]['country_id'], 'IT')
+        self.assertAlmostEqual(sum(prediction['probability'] for prediction in predictions), 1.0, places=5)
+        self.assertEqual(model.predict('andrewson', limit=2)[0]['country_id'], 'GB')
+        self.assertLessEqual(len(model.predict('andrewson', limit=2)), 2)
+        self.assertIsNone(model.predict('xyz'))
+
+    def test_missing_or_invalid_model_is_not_loaded(self):
+        model = NameModel()
+        self.assertFalse(model.load(self.path))
+        self.path.write_bytes(b'not a model at all, just some bytes')
+        self.assertFalse(model.load(self.path))
+        self.assertFalse(model.loaded)
+        self.assertIsNone(model.predict('andrew'))
+
+    @mock.patch('api.estimator.RELOAD_CHECK_INTERVAL', 0)
+    def test_rebuilt_model_is_mapped_without_restart(self):
+        model = NameModel()
+        self.assertFalse(model.load(self.path))
+        build_name_model(iter(TRAINING_NAMES[:3]), self.path)
+        self.assertEqual(model.predict('andrewson')[0]['country_id'], 'GB')
+        self.assertIsNone(model.predict('giulio'))
+
+        build_name_model(iter(TRAINING_NAMES), self.path)
+        self.assertEqual(model.predict('giulio')[0]['country_id'], 'IT')
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class NameEstimateTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        request_counter.flush()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        Country.objects.create(code='IT', name_common='Italy', name_official='Italian Republic')
+        country_cache.load()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'model.bin'
+        for name, probabilities in TRAINING_NAMES:
+            if 'IT' in probabilities:
+                UniqueName.objects.create(name=name)
+                NameCountryProbability.objects.create(name_id=name, country_id='IT', probability=probabilities['IT'])
+        call_command('train_name_model', output=self.path, stdout=StringIO())
+        model = NameModel()
+        model.load(self.path)
+        patcher = mock.patch('api.views.name_model', model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_upstream_failure_is_answered_with_estimate(self):
+        with mock.patch('api.views.parse_name_data', return_value=None):
+            response = self.client.get(reverse('name-stats'), {'name': 'Giulio', 'expand': 'none'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'name': 'giulio',
+            'requests_count': 0,
+            'country_predictions': [{'probability': 1.0, 'country': 'IT'}],
+            'estimated': True,
+        })
+        # Estimates are neither stored nor cached
+        self.assertFalse(UniqueName.objects.filter(name='giulio').exists())
+        self.assertIsNone(get_cached_name_response('giulio'))
+
+    def test_stored_names_are_not_estimated(self):
+        response = self.client.get(reverse('name-stats'), {'name': 'giovanni'})
+        self.assertFalse(response.json()['estimated'])
+
+    def test_batch_upstream_failure_is_answered_with_estimates(self):
+        with mock.patch('api.views.parse_names_data', return_value=None):
+            response = self.client.post(reverse('name-stats-batch'), {'names': ['giulio', 'xyz']}, format='json')
+
+        results = response.json()['results']
+        self.assertTrue(results['giulio']['estimated'])
+        self.assertEqual(results['giulio']['country_predictions'][0]['country']['code'], 'IT')
+        self.assertEqual(results['xyz'], {'error': 'Nationalize API error'})
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class RequestCounterTest(TransactionTestCase):
+    def setUp(self):
+        request_counter.flush()
+        UniqueName.objects.create(name='andrew')
+        UniqueName.objects.create(name='maria')
+
+    def test_concurrent_increments_are_flushed_exactly(self):
+        def hit():
+            for _ in range(200):
+                request_counter.increment('andrew')
+            request_counter.increment('maria')
+
+        threads = [threading.Thread(target=hit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(request_counter.flush(), 8 * 201)
+        # One UPDATE of names per distinct increment
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "api_uniquename"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(UniqueName.objects.get(name='andrew').request_count, 1 + 8 * 200)
+        self.assertEqual(UniqueName.objects.get(name='maria').request_count, 1 + 8)
+        self.assertEqual(request_counter.pending('andrew'), 0)
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class StaleNameRefreshTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        for code in ('GB', 'US', 'IE'):
+            Country.objects.create(code=code, name_common=code, name_official=code)
+        self.name_object = UniqueName.objects.create(name='andrew', refreshed_at=timezone.now() - timedelta(days=2))
+        NameCountryProbability.objects.create(name=self.name_object, country_id='GB', probability=0.5)
+        NameCountryProbability.objects.create(name=self.name_object, country_id='US', probability=0.2)
+
+    def test_stale_name_served_and_refresh_queued(self):
+        with (
+            mock.patch('api.views.parse_name_data') as parse,
+            mock.patch('api.views.name_refresher.enqueue') as enqueue,
+        ):
+            response = self.client.get(reverse('name-stats'), {'name': 'andrew'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['country_predictions']), 2)
+        parse.assert_not_called()
+        enqueue.assert_called_once_with('andrew')
+        self.assertIsNone(get_cached_name_response('andrew'))
+
+    def test_refresh_upserts_probabilities(self):
+        nationalize_data = {
+            'name': 'andrew',
+            'country': [{'country_id': 'GB', 'probability': 0.7}, {'country_id': 'IE', 'probability': 0.1}],
+        }
+        with mock.patch('api.views.parse_name_data', return_value=nationalize_data):
+            self.assertTrue(refresh_name('andrew'))
+
+        probabilities = dict(self.name_object.country_probabilities.values_list('country_id', 'probability'))
+        self.assertEqual(probabilities, {'GB': 0.7, 'IE': 0.1})
+        ranks = dict(self.name_object.country_ranks.values_list('country_id', 'probability'))
+        self.assertEqual(ranks, {'GB': 0.7, 'IE': 0.1})
+        self.name_object.refresh_from_db()
+        self.assertLess(timezone.now() - self.name_object.refreshed_at, timedelta(minutes=1))
+
+    def test_rank_update_keeps_counts_added_since_read(self):
+        update_name_ranks(['andrew'])
+        # A flush increments the leaderboard after the name's request count was read
+        CountryNameRank.objects.filter(name_id='andrew').update(request_count=F('request_count') + 4)
+        NameCountryProbability.objects.filter(name=self.name_object, country_id='GB').update(probability=0.6)
+        update_name_ranks(['andrew'])
+
+        rank = CountryNameRank.objects.get(name_id='andrew', country_id='GB')
+        self.assertEqual((rank.probability, rank.request_count), (0.6, 5))
+        self.assertAlmostEqual(rank.weighted_score, 3.0)
+
+    def test_refresher_queues_name_once(self):
+        refresher = NameRefresher()
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_refresh(name):
+            started.set()
+            release.wait(5)
+
+        with mock.patch('api.tasks.refresh_name', side_effect=blocking_refresh) as refresh:
+            self.assertTrue(refresher.enqueue('andrew'))
+            started.wait(5)
+            self.assertFalse(refresher.enqueue('andrew'))
+            release.set()
+            refresher._executor.shutdown(wait=True)
+
+        refresh.assert_called_once_with('andrew')
+
+
+class SingleFlightTest(TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls, results = [], []
+
+        def fetch(name):
+            calls.append(name)
+            release.wait(5)
+            return name.upper()
+
+        def request():
+            results.append(flight.do('andrew', fetch, 'andrew'))
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ['andrew'])
+        self.assertEqual({result for result, shared in results}, {'ANDREW'})
+        self.assertEqual(sorted(shared for result, shared in results), [False] + [True] * 9)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('andrew', mock.Mock(side_effect=ValueError))
+        self.assertEqual(flight.do('andrew', lambda: 'ok'), ('ok', False))
+
+    def test_name_created_elsewhere_is_not_fetched_again(self):
+        UniqueName.objects.create(name='andrew')
+        with mock.patch('api.views.parse_name_data') as parse:
+            name_object, created = create_name_object('andrew')
+
+        parse.assert_not_called()
+        self.assertEqual((name_object.name, created), ('andrew', False))
+
+    def test_lease_waiter_answers_from_name_stored_by_holder(self):
+        cache.clear()
+        held, release = threading.Event(), threading.Event()
+
+        def fetch_elsewhere():
+            with name_fetch_lease.hold('andrew') as leader:
+                self.assertTrue(leader)
+                held.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=fetch_elsewhere)
+        holder.start()
+        held.wait(5)
+        UniqueName.objects.create(name='andrew')
+        threading.Timer(0.2, release.set).start()
+        started = time.monotonic()
+        with mock.patch('api.views.parse_name_data') as parse:
+            name_object, created = create_name_object('andrew')
+        holder.join()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        parse.assert_not_called()
+        self.assertEqual((name_object.name, created), ('andrew', False))
+
+    def test_lease_is_released_after_failed_fetch(self):
+        cache.clear()
+        with mock.patch('api.views.parse_name_data', return_value=None):
+            self.assertEqual(create_name_object('andrew'), (None, False))
+
+        with name_fetch_lease.hold('andrew') as leader:
+            self.assertTrue(leader)
+
+
+class AsyncSingleFlightTest(SimpleTestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch(name):
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return name.upper()
+
+        async def run():
+            return await asyncio.gather(*(flight.do('andrew', fetch, 'andrew') for _ in range(10)))
+
+        results = async_to_sync(run)()
+        self.assertEqual(calls, ['andrew'])
+        self.assertEqual(sorted(results), [('ANDREW', False)] + [('ANDREW', True)] * 9)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise ValueError
+
+        async def ok():
+            return 'ok'
+
+        async def run():
+            results = await asyncio.gather(flight.do('andrew', fail), flight.do('andrew', fail), return_exceptions=True)
+            return results, await flight.do('andrew', ok)
+
+        errors, result = async_to_sync(run)()
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+        self.assertEqual(result, ('ok', False))
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class AsyncNameStatsViewTest(APITestCase):
+    def setUp(self):
+        request_counter.flush()
+        cache.clear()
+        country_cache.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        Country.objects.create(code='GB', name_common='United Kingdom', name_official='United Kingdom')
+        self.view = AsyncNameStatsView.as_view()
+
+    def request(self, name):
+        request = APIRequestFactory().get('/api/names/', {'name': name})
+        force_authenticate(request, user=self.user)
+        return request
+
+    def test_concurrent_cold_lookups_fetch_once(self):
+        async def fetch(name):
+            await asyncio.sleep(0.05)
+            return {'name': name, 'country': [{'country_id': 'GB', 'probability': 0.5}]}
+
+        async def run():
+            return await asyncio.gather(*(self.view(self.request('andrew')) for _ in range(20)))
+
+        with mock.patch('api.views.aparse_name_data', mock.AsyncMock(side_effect=fetch)) as parse:
+            responses = async_to_sync(run)()
+
+        parse.assert_awaited_once_with('andrew')
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_200_OK})
+        self.assertEqual(responses[0].data['country_predictions'][0]['country']['code'], 'GB')
+        request_counter.flush()
+        self.assertEqual(UniqueName.objects.get(name='andrew').request_count, 20)
+
+    def test_upstream_error(self):
+        with mock.patch('api.views.aparse_name_data', mock.AsyncMock(return_value=None)):
+            response = async_to_sync(self.view)(self.request('andrew'))
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(UniqueName.objects.filter(name='andrew').exists())
+
+    def test_upstream_error_answered_with_estimate_after_country_cache_invalidation(self):
+        country_cache.invalidate()
+        model = mock.Mock(predict=mock.Mock(return_value=[{'country_id': 'GB', 'probability': 0.8}]))
+        with (
+            mock.patch('api.views.aparse_name_data', mock.AsyncMock(return_value=None)),
+            mock.patch('api.views.name_model', model),
+        ):
+            response = async_to_sync(self.view)(self.request('andrew'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['estimated'])
+        self.assertEqual(response.data['country_predictions'][0]['country']['code'], 'GB')
+
+    def test_known_name_is_served_from_database(self):
+        UniqueName.objects.create(name='andrew')
+        with mock.patch('api.views.aparse_name_data') as parse:
+            response = async_to_sync(self.view)(self.request('andrew'))
+        parse.assert_not_called()
+        self.assertEqual(response.data['name'], 'andrew')
+
+    def test_unresolved_name_answered_from_negative_cache(self):
+        with mock.patch('api.views.aparse_name_data', mock.AsyncMock(return_value={'name': 'xqz', 'country': []})) as parse:
+            first = async_to_sync(self.view)(self.request('xqz'))
+            second = async_to_sync(self.view)(self.request('xqz'))
+
+        parse.assert_awaited_once()
+        self.assertEqual(first.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(second.data, first.data)
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0, NATIONALIZE_BATCH_SIZE=2)
+class NameStatsBatchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        country_cache.invalidate()
+        request_counter.flush()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('name-stats-batch')
+        for code in ('GB', 'US'):
+            Country.objects.create(code=code, name_common=code, name_official=code)
+        name_object = UniqueName.objects.create(name='andrew')
+        NameCountryProbability.objects.create(name=name_object, country_id='GB', probability=0.5)
+
+    def test_batch_answers_cached_and_fetches_missing_in_chunks(self):
+        chunks = {
+            ('maria', 'ivan'): [{'name': 'maria', 'count': 10, 'country': [{'country_id': 'US', 'probability': 0.3}]}],
+            ('olga',): [{'name': 'olga', 'count': 3, 'country': []}],
+        }
+        with mock.patch('api.views.parse_names_data', side_effect=lambda names: chunks[tuple(names)]) as parse:
+            response = self.client.post(self.url, {'names': ['andrew', 'maria', 'ivan', 'olga', 'andrew']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(parse.call_args_list, [mock.call(['maria', 'ivan']), mock.call(['olga'])])
+        results = response.json()['results']
+        self.assertEqual(list(results), ['andrew', 'maria', 'ivan', 'olga'])
+        self.assertEqual(results['andrew']['requests_count'], 2)
+        self.assertEqual(results['andrew']['country_predictions'][0]['country']['code'], 'GB')
+        self.assertEqual(results['maria']['country_predictions'][0]['probability'], 0.3)
+        self.assertEqual(results['olga']['negative_cache']['failures'], 1)
+        self.assertIn('error', results['ivan'])
+        self.assertEqual(UniqueName.objects.count(), 2)
+
+    def test_upstream_errors_are_reported_per_name(self):
+        with mock.patch('api.views.parse_names_data', return_value=None):
+            response = self.client.post(self.url, {'names': ['andrew', 'maria']}, format='json')
+
+        results = response.json()['results']
+        self.assertEqual(results['andrew']['name'], 'andrew')
+        self.assertEqual(results['maria'], {'error': 'Nationalize API error'})
+
+    @override_settings(NATIONALIZE_BATCH_SIZE=1, NAME_BATCH_DEADLINE=0.2)
+    def test_chunks_not_fetched_before_deadline_are_reported(self):
+        release = threading.Event()
+
+        def parse(names):
+            if names == ['ivan']:
+                release.wait(5)
+            return [{'name': names[0], 'count': 1, 'country': [{'country_id': 'US', 'probability': 0.4}]}]
+
+        started = time.monotonic()
+        with mock.patch('api.views.parse_names_data', side_effect=parse):
+            response = self.client.post(self.url, {'names': ['maria', 'ivan', 'olga']}, format='json')
+        release.set()
+
+        self.assertLess(time.monotonic() - started, 2)
+        results = response.json()['results']
+        self.assertEqual(results['maria']['country_predictions'][0]['probability'], 0.4)
+        self.assertEqual(results['olga']['country_predictions'][0]['probability'], 0.4)
+        self.assertEqual(results['ivan'], {'error': 'Nationalize API error'})
+
+    def test_batch_schema(self):
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        operation = response.json()['paths']['/api/names/batch/']['post']
+
+        self.assertEqual(operation['summary'], 'Get statistics for several names')
+        self.assertIn('requestBody', operation)
+        self.assertIn('expand', [parameter['name'] for parameter in operation['parameters']])
+
+    def test_batch_is_throttled_per_nationalize_request(self):
+        view = NameStatsBatchView()
+        request = mock.Mock(data={'names': [f'name{index}' for index in range(25)]})
+        self.assertEqual(SlidingWindowUserRateThrottle.get_cost(request, view), 13)
+        self.assertEqual(SlidingWindowUserRateThrottle.get_cost(mock.Mock(data={}), view), 1)
+        self.assertEqual(SlidingWindowUserRateThrottle.get_cost(request, None), 1)
+
+    def test_empty_batch_rejected(self):
+        response = self.client.post(self.url, {'names': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PopularNamesPaginationTest(APITestCase):
+    def setUp(self):
+        request_counter.flush()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('popular-names')
+        Country.objects.create(code='GB', name_common='GB', name_official='GB')
+        Country.objects.create(code='US', name_common='US', name_official='US')
+        for index, name in enumerate(['andrew', 'bob', 'carl', 'dan', 'eve', 'fred', 'gary']):
+            name_object = UniqueName.objects.create(name=name, request_count=10 - index // 2)
+            NameCountryProbability.objects.create(name=name_object, country_id='GB', probability=0.5)
+        NameCountryProbability.objects.create(name_id='bob', country_id='US', probability=0.5)
+        NameCountryProbability.objects.filter(name_id='gary').update(probability=0.9)
+        rebuild_leaderboard()
+        country_cache.load()
+
+    def test_default_limit_is_top_five(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'country': 'GB'})
+
+        self.assertEqual(
+            response.json(),
+            [{'name': name, 'frequency': count} for name, count in
+             [('andrew', 10.0), ('bob', 10.0), ('carl', 9.0), ('dan', 9.0), ('eve', 8.0)]],
+        )
+        self.assertIn('rel="next"', response['Link'])
+
+    def test_cursor_pages_cover_all_names(self):
+        response = self.client.get(self.url, {'country': 'GB', 'limit': 3})
+        names = [item['name'] for item in response.json()]
+        while response.has_header('Link'):
+            response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+            names.extend(item['name'] for item in response.json())
+
+        self.assertEqual(names, ['andrew', 'bob', 'carl', 'dan', 'eve', 'fred', 'gary'])
+
+    def test_weighted_ranking(self):
+        response = self.client.get(self.url, {'country': 'GB', 'ranking': 'weighted', 'limit': 2})
+        # Gary: 7 requests * 0.9, Andrew: 10 * 0.5
+        self.assertEqual([item['name'] for item in response.json()], ['gary', 'andrew'])
+        response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+        self.assertEqual([item['name'] for item in response.json()], ['bob', 'carl'])
+
+    @override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+    def test_leaderboard_follows_flushed_counts(self):
+        for _ in range(5):
+            request_counter.increment('gary')
+        request_counter.flush()
+
+        response = self.client.get(self.url, {'country': 'GB', 'limit': 1})
+        self.assertEqual(response.json(), [{'name': 'gary', 'frequency': 12.0}])
+        rank = CountryNameRank.objects.get(country_id='GB', name_id='gary')
+        self.assertAlmostEqual(rank.weighted_score, 12 * 0.9)
+
+    def test_invalid_pagination_parameters(self):
+        for params in (
+            {'limit': 0}, {'limit': 'ten'}, {'cursor': 'not-a-cursor'}, {'ranking': 'random'}, {'window': 'year'},
+        ):
+            response = self.client.get(self.url, {'country': 'GB', **params})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class PopularNamesWindowTest(APITestCase):
+    def setUp(self):
+        request_counter.flush()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('popular-names')
+        Country.objects.create(code='GB', name_common='GB', name_official='GB')
+        for name, request_count in (('andrew', 100), ('bob', 1), ('carl', 1)):
+            UniqueName.objects.create(name=name, request_count=request_count)
+            NameCountryProbability.objects.create(name_id=name, country_id='GB', probability=0.5)
+        rebuild_leaderboard()
+        country_cache.load()
+
+        self.now = timezone.now()
+        hour = bucket_hour(self.now)
+        NameRequestBucket.objects.bulk_create([
+            NameRequestBucket(name_id='andrew', hour=hour - timedelta(days=40), request_count=90),
+            NameRequestBucket(name_id='andrew', hour=hour - timedelta(days=3), request_count=6),
+            NameRequestBucket(name_id='carl', hour=hour - timedelta(hours=2), request_count=2),
+            NameRequestBucket(name_id='carl', hour=hour - timedelta(hours=2), request_count=2),
+        ])
+
+    def test_flushes_append_hourly_buckets(self):
+        for _ in range(2):
+            for _ in range(3):
+                request_counter.increment('bob')
+            request_counter.flush()
+
+        buckets = NameRequestBucket.objects.filter(name_id='bob')
+        self.assertEqual(list(buckets.values_list('hour', 'request_count')), [(bucket_hour(timezone.now()), 3)] * 2)
+
+    def test_rollup_compacts_buckets_and_ranks_windows(self):
+        for _ in range(5):
+            request_counter.increment('bob')
+        request_counter.flush()
+
+        result = rollup_requests(self.now)
+        self.assertEqual(result, {'merged': 1, 'expired': 1, 'ranks': {'day': 2, 'week': 3, 'month': 3}})
+        self.assertEqual(
+            list(NameRequestBucket.objects.filter(name_id='carl').values_list('request_count', flat=True)), [4]
+        )
+        rank = CountryNameWindowRank.objects.get(window='week', name_id='andrew')
+        self.assertEqual((rank.request_count, rank.weighted_score), (6, 3.0))
+
+        response = self.client.get(self.url, {'country': 'GB', 'window': 'day'})
+        self.assertEqual(response.json(), [{'name': 'bob', 'frequency': 5.0}, {'name': 'carl', 'frequency': 4.0}])
+        response = self.client.get(self.url, {'country': 'GB', 'window': 'week', 'limit': 1})
+        self.assertEqual(response.json(), [{'name': 'andrew', 'frequency': 6.0}])
+        response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+        self.assertEqual(response.json(), [{'name': 'bob', 'frequency': 5.0}])
+
+        # Lifetime counts still rank by default
+        response = self.client.get(self.url, {'country': 'GB', 'limit': 1})
+        self.assertEqual(response.json(), [{'name': 'andrew', 'frequency': 100.0}])
+
+    def test_rollup_command(self):
+        out = StringIO()
+        call_command('rollup_requests', stdout=out)
+        self.assertIn('1 bucket rows merged, 1 expired; window ranks: day 1, week 2, month 2', out.getvalue())
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class NameStatsQueryCountTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        self.url = reverse('name-stats')
+        self.countries = [
+            Country.objects.create(code=code, name_common=code, name_official=code)
+            for code in ('GB', 'US', 'IE', 'FR', 'DE')
+        ]
+        country_cache.load()
+
+    def create_name(self, name, countries):
+        name_object = UniqueName.objects.create(name=name)
+        for country in countries:
+            NameCountryProbability.objects.create(name=name_object, country=country, probability=0.1)
+
+    def test_query_count_does_not_depend_on_country_count(self):
+        self.create_name('andrew', self.countries[:1])
+        self.create_name('maria', self.countries)
+
+        # Name lookup and one query for all predictions
+        for name, count in (('andrew', 1), ('maria', 5)):
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, {'name': name})
+            self.assertEqual(len(response.json()['country_predictions']), count)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
+class MetricsTest(APITestCase):
+    def setUp(self):
+        request_counter.flush()
+        cache.clear()
+        country_cache.invalidate()
+        user = User.objects.create_user(username='test_user', password='test!12354')
+        self.client.force_authenticate(user)
+        Country.objects.create(code='GB', name_common='United Kingdom', name_official='United Kingdom')
+        self.url = reverse('name-stats')
+
+    def test_lookup_outcomes_and_server_timing(self):
+        lookups = {outcome: sample('namebase_name_lookups_total', outcome=outcome) for outcome in ('cold', 'hit')}
+        data = {'name': 'andrew', 'country': [{'country_id': 'GB', 'probability': 0.5}]}
+        with mock.patch('api.views.parse_name_data', return_value=data):
+            cold = self.client.get(self.url, {'name': 'andrew'})
+        hit = self.client.get(self.url, {'name': 'andrew'})
+
+        self.assertEqual(sample('namebase_name_lookups_total', outcome='cold'), lookups['cold'] + 1)
+        self.assertEqual(sample('namebase_name_lookups_total', outcome='hit'), lookups['hit'] + 1)
+        self.assertRegex(cold['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", .*predictions;dur=.*serialize;dur=')
+        self.assertRegex(hit['Server-Timing'], r'^total;dur=[\d.]+$')
+        self.assertGreater(sample('namebase_request_db_queries_count', view='name-stats'), 0)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_upstream_latency(self):
+        stub = StubUpstream()
+        self.addCleanup(stub.stop)
+        stub.responses = [(404, {})]
+        client = UpstreamClient('metrics-stub', stub.url)
+        self.addCleanup(client.close)
+
+        client.get()
+        self.assertEqual(sample('namebase_upstream_duration_seconds_count', upstream='metrics-stub', outcome='404'), 1)
+
+    def test_metrics_endpoint(self):
+        self.client.force_authenticate(None)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'namebase_request_duration_seconds', response.content)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='secret')
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, status.HTTP_200_OK)
+
+
+@override_settings(REQUEST_COUNT_FLUSH_INTERVAL=0)
 class APITestView(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='test_user', password='test!12354')
@@ -13,6 +1577,7 @@ class APITestView(APITestCase):
 
         self.test_name = 'Andrew'
         self.test_country = 'GB'
+        country_cache.invalidate()
 
 
     def test_get_name_stats_no_param(self):
@@ -21,8 +1586,15 @@ class APITestView(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_name_stats_with_param(self):
+        stub = StubUpstream()
+        self.addCleanup(stub.stop)
+        stub.responses = [(200, {'name': self.test_name, 'country': [{'country_id': 'GB', 'probability': 0.5}]})]
+        nationalize = UpstreamClient('nationalize', stub.url)
+        self.addCleanup(nationalize.close)
+
         url = reverse('name-stats')
-        response = self.client.get(f'{url}?name={self.test_name}', format='json')
+        with mock.patch('api.views.nationalize_client', nationalize):
+            response = self.client.get(f'{url}?name={self.test_name}', format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_popular_names_by_country_no_param(self):
@@ -0,0 +1,68 @@
+from rest_framework.throttling import UserRateThrottle
+
+
+class SlidingWindowUserRateThrottle(UserRateThrottle):
+    """
+    User rate throttle with a sliding window counter kept in the shared cache.
+
+    The estimated rate is the count of the current fixed window plus the count of the previous
+    one weighted by the share of it still inside the sliding window. A request costs one atomic
+    increment, taken back if the request is throttled, so only allowed requests count against
+    the rate; the final count of the previous window is read once per window and process.
+    Views with a `get_throttle_cost(request)` method are charged its result instead of one request
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    # Previous window counts by throttle key: (window, count), emptied when it grows past the limit
+    previous_counts = {}
+    previous_counts_limit = 10000
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, position = divmod(self.now, self.duration)
+        cost = self.get_cost(request, view)
+        cache_key = f'{self.key}:{int(window)}'
+        count = self.increment(cache_key, cost)
+        previous_count = self.get_previous_count(int(window) - 1)
+        estimate = previous_count * (1 - position / self.duration) + count
+        if estimate > self.num_requests:
+            self.cache.decr(cache_key, cost)
+            return self.throttle_failure()
+        return True
+
+    @staticmethod
+    def get_cost(request, view) -> int:
+        get_throttle_cost = getattr(view, 'get_throttle_cost', None)
+        return get_throttle_cost(request) if get_throttle_cost else 1
+
+    def increment(self, cache_key: str, cost: int = 1) -> int:
+        try:
+            return self.cache.incr(cache_key, cost)
+        except ValueError:
+            # First request of the window; add() lets only one of concurrent first requests create the counter.
+            # Counters live for two windows, as each is read as the previous window of the next one
+            if self.cache.add(cache_key, cost, timeout=2 * self.duration):
+                return cost
+            return self.cache.incr(cache_key, cost)
+
+    def get_previous_count(self, window: int) -> int:
+        cached = self.previous_counts.get(self.key)
+        if cached and cached[0] == window:
+            return cached[1]
+        count = self.cache.get(f'{self.key}:{window}', 0)
+        if len(self.previous_counts) >= self.previous_counts_limit:
+            self.previous_counts.clear()
+        self.previous_counts[self.key] = (window, count)
+        return count
+
+    def wait(self):
+        # Until the current window ends, when the weight of its requests starts decreasing
+        return self.duration - self.now % self.duration
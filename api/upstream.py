@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from urllib.parse import urljoin
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from .metrics import UPSTREAM_LATENCY, record
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and every call
+    fails fast for `reset_timeout` seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again. A trial that reports
+    no outcome within `reset_timeout` counts as failed, so a lost trial can't wedge the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN and now - self.half_opened_at >= self.reset_timeout:
+                logger.error(f'Trial call of circuit {self.name} reported no outcome, circuit opened again')
+                self.state = self.OPEN
+                self.opened_at = now
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.half_opened_at = now
+                return
+            raise CircuitOpenError(f'Circuit for {self.name} is {self.state}')
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f'Circuit for {self.name} opened after {self.failures} failures')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class CappedRetry(Retry):
+    """
+    Retry honouring Retry-After only up to backoff_max, like AsyncUpstreamClient, so an upstream
+    asking for a long pause can't hold a worker for it
+    """
+
+    def get_retry_after(self, response) -> float or None:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.backoff_max)
+
+
+class UpstreamClient:
+    """
+    HTTP client for a single upstream API.
+
+    Keeps a keep-alive connection pool, bounds every call with connect/read timeouts,
+    retries 429/5xx and connection errors with jittered exponential backoff
+    (honouring Retry-After up to backoff_max) and guards the upstream with a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5.0,
+        retries: int = 2,
+        backoff_factor: float = 0.2,
+        backoff_jitter: float = 0.2,
+        backoff_max: float = 5.0,
+        pool_size: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+        retry = CappedRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            backoff_max=backoff_max,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path: str = '', **kwargs) -> requests.Response:
+        """
+        GET `path` relative to the base url, raising CircuitOpenError when the upstream is unavailable
+        """
+        self.breaker.before_request()
+        started = time.perf_counter()
+        try:
+            response = self.session.get(urljoin(self.base_url, path), timeout=self.timeout, **kwargs)
+        except BaseException:
+            # Any call ending without a response is a failure, or a half-open circuit would wait for it
+            self.breaker.record_failure()
+            record(self.name, time.perf_counter() - started, UPSTREAM_LATENCY, upstream=self.name, outcome='error')
+            raise
+
+        if response.status_code in RETRY_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        record(
+            self.name, time.perf_counter() - started, UPSTREAM_LATENCY,
+            upstream=self.name, outcome=response.status_code,
+        )
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamClient built on httpx.
+
+    Same timeouts, retry policy and circuit breaker (shared with the sync client of the
+    upstream), with one keep-alive connection pool per event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        breaker: CircuitBreaker,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5.0,
+        retries: int = 2,
+        backoff_factor: float = 0.2,
+        backoff_jitter: float = 0.2,
+        backoff_max: float = 5.0,
+        pool_size: int = 100,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.breaker = breaker
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.backoff_max = backoff_max
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return client
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return min(self.backoff_factor * 2 ** attempt + random.uniform(0, self.backoff_jitter), self.backoff_max)
+
+    async def get(self, path: str = '', **kwargs) -> httpx.Response:
+        """
+        GET `path` relative to the base url, raising CircuitOpenError when the upstream is unavailable
+        """
+        self.breaker.before_request()
+        url = urljoin(self.base_url, path)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            for attempt in range(self.retries + 1):
+                response = None
+                try:
+                    response = await self._client().get(url, **kwargs)
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        self.breaker.record_success()
+                        outcome = response.status_code
+                        return response
+                    if attempt == self.retries:
+                        outcome = response.status_code
+                        return response
+                await asyncio.sleep(self._backoff(attempt, response))
+        finally:
+            # Everything but a success fails the call: exhausted retries, other errors and
+            # cancellation (a client disconnecting under ASGI) alike
+            if outcome == 'error' or outcome in RETRY_STATUSES:
+                self.breaker.record_failure()
+            record(self.name, time.perf_counter() - started, UPSTREAM_LATENCY, upstream=self.name, outcome=outcome)
+
+    async def close(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def build_client(name: str, base_url: str) -> UpstreamClient:
+    """
+    Creating an upstream client configured from settings.UPSTREAM_CLIENT
+    """
+    config = settings.UPSTREAM_CLIENT
+    return UpstreamClient(
+        name,
+        base_url,
+        connect_timeout=config['CONNECT_TIMEOUT'],
+        read_timeout=config['READ_TIMEOUT'],
+        retries=config['RETRIES'],
+        backoff_factor=config['BACKOFF_FACTOR'],
+        backoff_jitter=config['BACKOFF_JITTER'],
+        pool_size=config['POOL_SIZE'],
+        failure_threshold=config['BREAKER_THRESHOLD'],
+        reset_timeout=config['BREAKER_RESET_TIMEOUT'],
+    )
+
+
+def build_async_client(client: UpstreamClient) -> AsyncUpstreamClient:
+    """
+    Creating an async client for the upstream of a sync client, sharing its circuit breaker
+    """
+    config = settings.UPSTREAM_CLIENT
+    return AsyncUpstreamClient(
+        client.name,
+        client.base_url,
+        client.breaker,
+        connect_timeout=config['CONNECT_TIMEOUT'],
+        read_timeout=config['READ_TIMEOUT'],
+        retries=config['RETRIES'],
+        backoff_factor=config['BACKOFF_FACTOR'],
+        backoff_jitter=config['BACKOFF_JITTER'],
+        pool_size=config['ASYNC_POOL_SIZE'],
+    )
+
+
+nationalize_client = build_client('nationalize', settings.NATIONALIZE_URL)
+restcountries_client = build_client('restcountries', settings.RESTCOUNTRIES_URL)
+async_nationalize_client = build_async_client(nationalize_client)
@@ -1,9 +1,23 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import NameStatsView, PopularNamesByCountryView
+from .views import (
+    CountryDetailView,
+    CountryListView,
+    NameStatsBatchView,
+    NameStatsView,
+    PopularNamesByCountryView,
+)
+
+if settings.ASYNC_API_VIEWS:
+    from .async_views import AsyncNameStatsView as NameStatsView
+    from .async_views import AsyncPopularNamesByCountryView as PopularNamesByCountryView
 
 urlpatterns = [
     path('names/', NameStatsView.as_view(), name='name-stats'),
+    path('names/batch/', NameStatsBatchView.as_view(), name='name-stats-batch'),
     path('popular-names/', PopularNamesByCountryView.as_view(), name='popular-names'),
+    path('countries/', CountryListView.as_view(), name='countries'),
+    path('countries/<str:code>/', CountryDetailView.as_view(), name='country'),
 ]
 
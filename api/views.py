@@ -1,31 +1,86 @@
+import hashlib
 import logging
-from datetime import timedelta
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import copy_context
 
+import httpx
+import orjson
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from .models import Country, NameCountryProbability, UniqueName
+from .cache import (
+    NegativeCache,
+    country_cache,
+    country_negative_cache,
+    get_cached_name_response,
+    invalidate_cached_name_response,
+    name_negative_cache,
+    set_cached_name_response,
+)
+from .counters import request_counter
+from .estimator import name_model
+from .leaderboard import update_name_ranks
+from .metrics import (
+    NAME_ESTIMATES,
+    NAME_LOOKUPS,
+    PREDICTIONS_WRITE_TIME,
+    SERIALIZATION_TIME,
+    timed,
+)
+from .models import (
+    Country,
+    CountryNameRank,
+    CountryNameWindowRank,
+    NameCountryProbability,
+    UniqueName,
+)
+from .names import normalize_name
+from .pagination import after_cursor, decode_cursor, encode_cursor
+from .routers import mark_names_written, pin_primary, pin_primary_if_written
+from .schema import OpenApiParameter, OpenApiTypes, extend_schema
 from .serializers import (
     CountrySerializer,
     FinalAnswerSerializer,
+    NameBatchSerializer,
     PopularNameSerializer,
 )
+from .singleflight import advisory_lock, name_fetch_lease, name_flight
+from .tasks import name_refresher
+from .upstream import (
+    CircuitOpenError,
+    async_nationalize_client,
+    nationalize_client,
+    restcountries_client,
+)
 
 logger = logging.getLogger(__name__)
-nationalize_url = 'https://api.nationalize.io/?name='
-restcountries_url = 'https://restcountries.com/v3.1/alpha/'
+
+# restcountries API fields used by build_country_data
+CATALOGUE_FIELDS = (
+    'name', 'altSpellings', 'region', 'capital', 'latlng', 'independent',
+    'maps', 'flags', 'coatOfArms', 'borders',
+)
+CATALOGUE_FIELDS_PER_REQUEST = 10
+
+MAX_NAME_LENGTH = UniqueName._meta.get_field('name').max_length
 
 def parse_name_data(name: str) -> dict or None:
     """
     Parsing name data from nationalize API
     """
     try:
-        response = requests.get(f'{nationalize_url}{name}')
+        response = nationalize_client.get(params={'name': name})
         response.raise_for_status()
         return response.json()
     except requests.exceptions.Timeout:
@@ -42,35 +97,81 @@ def parse_name_data(name: str) -> dict or None:
         return None
 
 
+async def aparse_name_data(name: str) -> dict or None:
+    """
+    Parsing name data from nationalize API without blocking the event loop
+    """
+    try:
+        response = await async_nationalize_client.get(params={'name': name})
+        response.raise_for_status()
+        return response.json()
+    except httpx.TimeoutException:
+        logger.error(f"Timeout while parsing name data for: {name}")
+        return None
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error for name {name} in nationalize API: {e.response.status_code} - {e.response.text}")
+        return None
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        logger.error(f"RequestException while parsing name {name}: {e}")
+        return None
+    except ValueError as e:
+        logger.error(f"Could not decode JSON from Nationalize API for name '{name}': {e}")
+        return None
+
+
+def parse_names_data(names: list[str]) -> list[dict] or None:
+    """
+    Parsing data for several names from nationalize API in one request.
+    Names in the answer are normalized, so they match the requested canonical keys
+    """
+    try:
+        response = nationalize_client.get(params={'name[]': names})
+        response.raise_for_status()
+        nationalize_data = response.json()
+        for name_data in nationalize_data:
+            name_data['name'] = normalize_name(str(name_data.get('name', '')))
+        return nationalize_data
+    except requests.exceptions.RequestException as e:
+        logger.error(f"RequestException while parsing names {names}: {e}")
+        return None
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Could not decode JSON from Nationalize API for names {names}: {e}")
+        return None
+
+
+def build_country_data(raw_data: dict) -> dict:
+    """
+    Mapping a restcountries API country record to Country fields
+    """
+    return {
+        'code': raw_data.get('cca2'),
+        'name_common': raw_data['name'].get('common'),
+        'name_official': raw_data['name'].get('official'),
+        'possible_names': raw_data.get('altSpellings', []),
+        'region': raw_data.get('region', ''),
+        'capital_name': raw_data.get('capital', [''])[0] if raw_data.get('capital') else '',
+        'capital_latitude': raw_data.get('latlng', [None])[0],
+        'capital_longitude': raw_data.get('latlng', [None, None])[1],
+        'independent': raw_data.get('independent'),
+        'google_maps_url': raw_data['maps'].get('googleMaps'),
+        'open_maps_url': raw_data['maps'].get('openStreetMaps'),
+        'flag_png_url': raw_data['flags'].get('png'),
+        'flag_svg_url': raw_data['flags'].get('svg'),
+        'flag_alt_text': raw_data['flags'].get('alt'),
+        'coat_of_arms_png_url': raw_data['coatOfArms'].get('png'),
+        'coat_of_arms_svg_url': raw_data['coatOfArms'].get('svg'),
+        'borders': raw_data.get('borders', [])
+    }
+
+
 def parse_country_data(code: str) -> dict or None:
     """
     Parsing country data from restcountries API
     """
     try:
-        response = requests.get(f'{restcountries_url}{code}')
+        response = restcountries_client.get(f'alpha/{code}')
         response.raise_for_status()
-
-        raw_data = response.json()[0]
-        data = {
-            'code': raw_data.get('cca2'),
-            'name_common': raw_data['name'].get('common'),
-            'name_official': raw_data['name'].get('official'),
-            'possible_names': raw_data.get('altSpellings', []),
-            'region': raw_data.get('region', ''),
-            'capital_name': raw_data.get('capital', [''])[0] if raw_data.get('capital') else '',
-            'capital_latitude': raw_data.get('latlng', [None])[0],
-            'capital_longitude': raw_data.get('latlng', [None, None])[1],
-            'independent': raw_data.get('independent'),
-            'google_maps_url': raw_data['maps'].get('googleMaps'),
-            'open_maps_url': raw_data['maps'].get('openStreetMaps'),
-            'flag_png_url': raw_data['flags'].get('png'),
-            'flag_svg_url': raw_data['flags'].get('svg'),
-            'flag_alt_text': raw_data['flags'].get('alt'),
-            'coat_of_arms_png_url': raw_data['coatOfArms'].get('png'),
-            'coat_of_arms_svg_url': raw_data['coatOfArms'].get('svg'),
-            'borders': raw_data.get('borders', [])
-        }
-        return data
+        return build_country_data(response.json()[0])
     except requests.exceptions.Timeout:
         logger.error(f"Timeout while parsing country data for: {code}")
         return None
@@ -86,157 +187,769 @@ def parse_country_data(code: str) -> dict or None:
         return None
 
 
-def create_or_update_country_and_probability_objects(name_object: UniqueName, data: dict) -> None:
+def parse_countries_data(codes: list[str]) -> list[dict]:
     """
-    Creating or updating country and probability objects
+    Parsing data for several countries from restcountries API.
+    Uses a single `alpha?codes=` request and falls back to fetching the codes it did not
+    return concurrently, one request per code.
     """
-    for nationalize_data_country in data.get('country'):
-        country_code = nationalize_data_country['country_id']
-        probability = nationalize_data_country.get('probability')
+    if not codes:
+        return []
+
+    countries = []
+    try:
+        response = restcountries_client.get('alpha', params={'codes': ','.join(codes)})
+        response.raise_for_status()
+        countries = [build_country_data(raw_data) for raw_data in response.json()]
+    except requests.exceptions.RequestException as e:
+        logger.error(f"RequestException while parsing countries {codes}: {e}")
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"Error parsing data for countries {codes}: {e}")
+
+    missing_codes = set(codes) - {country['code'] for country in countries}
+    if missing_codes:
+        workers = min(len(missing_codes), settings.COUNTRY_FETCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            countries.extend(data for data in executor.map(parse_country_data, missing_codes) if data)
+
+    return countries
 
-        # Getting or creating a country object:
+
+def parse_country_catalogue() -> list[dict] or None:
+    """
+    Parsing raw data for all countries from restcountries API.
+    The `all` endpoint accepts a limited number of fields per request, so the fields are
+    requested in chunks and merged by country code.
+    """
+    catalogue = {}
+    for start in range(0, len(CATALOGUE_FIELDS), CATALOGUE_FIELDS_PER_REQUEST - 1):
+        fields = ['cca2', *CATALOGUE_FIELDS[start:start + CATALOGUE_FIELDS_PER_REQUEST - 1]]
         try:
-            country_object = Country.objects.get(code=country_code)
-        except Country.DoesNotExist:
-            country_data = parse_country_data(country_code)
-            if not country_data:
-                logger.error(f'Nationalize API error while parsing {country_code} data')
-                continue
+            response = restcountries_client.get('all', params={'fields': ','.join(fields)})
+            response.raise_for_status()
+            for raw_data in response.json():
+                catalogue.setdefault(raw_data['cca2'], {}).update(raw_data)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"RequestException while parsing country catalogue: {e}")
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Error parsing country catalogue: {e}")
+            return None
+
+    return list(catalogue.values())
 
-            country_serializer = CountrySerializer(data=country_data)
-            if country_serializer.is_valid(raise_exception=True):
-                country_serializer.save()
-                logger.info(f'Country object with code {country_code} was created successfully')
 
-            country_object = country_serializer.instance
+def get_or_create_countries(codes) -> set[str]:
+    """
+    Getting codes of countries present in database, creating missing ones in one batch.
+    The country catalogue is normally preloaded with the `sync_countries` command,
+    so missing countries are only fetched when explicitly enabled
+    """
+    existing_codes = set(Country.objects.filter(code__in=codes).values_list('code', flat=True))
+    missing_codes = [code for code in codes if code not in existing_codes]
+    if missing_codes and not settings.COUNTRY_FETCH_ON_REQUEST:
+        logger.warning(f'Countries {missing_codes} are missing from database, run sync_countries command')
+        missing_codes = []
+    elif missing_codes:
+        # Codes that failed recently are not requested again until their negative cache entry expires
+        failed_codes = country_negative_cache.get_many(missing_codes)
+        if failed_codes:
+            logger.warning(f'Countries {sorted(failed_codes)} failed recently, not requested again yet')
+        missing_codes = [code for code in missing_codes if code not in failed_codes]
 
-        # Getting or creating a probability object:
-        probability_object, created = NameCountryProbability.objects.get_or_create(
-            name=name_object,
-            country=country_object,
-            defaults={'probability': probability}
+    if missing_codes:
+        country_serializer = CountrySerializer(data=parse_countries_data(missing_codes), many=True)
+        country_serializer.is_valid(raise_exception=True)
+        Country.objects.bulk_create(
+            [Country(**country_data) for country_data in country_serializer.validated_data],
+            ignore_conflicts=True,
         )
-        if created:
-            logger.info(
-                f'NameCountryProbability object for {name_object.name} and {country_code} was created successfully'
-            )
+        created_codes = {country_data['code'] for country_data in country_serializer.validated_data}
+        existing_codes |= created_codes
+        if created_codes:
+            logger.info(f'Country objects with codes {sorted(created_codes)} were created successfully')
+
+        for country_code in set(missing_codes) - created_codes:
+            logger.error(f'Restcountries API error while parsing {country_code} data')
+            country_negative_cache.record(country_code)
+
+    return existing_codes
+
+
+@timed('predictions', PREDICTIONS_WRITE_TIME)
+def create_or_update_country_and_probability_objects(name_object: UniqueName, data: dict) -> None:
+    """
+    Creating or updating country and probability objects
+    """
+    probabilities = {
+        nationalize_data_country['country_id']: nationalize_data_country.get('probability')
+        for nationalize_data_country in data.get('country')
+    }
+
+    existing_codes = get_or_create_countries(probabilities)
+
+    # Upserting probability objects and removing countries that dropped out of the prediction:
+    with transaction.atomic():
+        NameCountryProbability.objects.bulk_create(
+            [
+                NameCountryProbability(name=name_object, country_id=country_code, probability=probability)
+                for country_code, probability in probabilities.items()
+                if country_code in existing_codes
+            ],
+            update_conflicts=True,
+            unique_fields=['name', 'country'],
+            update_fields=['probability'],
+        )
+        NameCountryProbability.objects.filter(name=name_object).exclude(country_id__in=existing_codes).delete()
+
+        name_object.refreshed_at = timezone.now()
+        UniqueName.objects.filter(name=name_object.name).update(refreshed_at=name_object.refreshed_at)
+        update_name_ranks([name_object.name])
+    logger.info(f'NameCountryProbability objects for {name_object.name} were updated successfully')
+    mark_names_written([name_object.name])
+    invalidate_cached_name_response(name_object.name)
 
     return None
 
 
-class NameStatsView(APIView):
-    @extend_schema(
-        summary="Get name statistics",
-        description="Get statistics for a given name by country",
-        parameters=[
-            OpenApiParameter(
-                name='name',
-                type=OpenApiTypes.STR,
-                location=OpenApiParameter.QUERY,
-                required=True,
-                description='Name to get statistics for.'
+def create_name_objects(nationalize_data: list[dict], request_count: int = 1) -> None:
+    """
+    Creating name and probability objects for several new names in bulk
+    """
+    UniqueName.objects.bulk_create(
+        [UniqueName(name=name_data['name'], request_count=request_count) for name_data in nationalize_data],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['refreshed_at'],
+    )
+    existing_codes = get_or_create_countries(
+        list({country['country_id']: None for name_data in nationalize_data for country in name_data.get('country', [])})
+    )
+    NameCountryProbability.objects.bulk_create(
+        [
+            NameCountryProbability(
+                name_id=name_data['name'],
+                country_id=country['country_id'],
+                probability=country.get('probability'),
             )
+            for name_data in nationalize_data
+            for country in name_data.get('country', [])
+            if country['country_id'] in existing_codes
         ],
-        responses={
-            200: FinalAnswerSerializer,
-            400: OpenApiTypes.OBJECT,
-            404: OpenApiTypes.OBJECT,
-        }
+        update_conflicts=True,
+        unique_fields=['name', 'country'],
+        update_fields=['probability'],
     )
+    update_name_ranks([name_data['name'] for name_data in nationalize_data])
+    mark_names_written([name_data['name'] for name_data in nationalize_data])
+    logger.info(f'{len(nationalize_data)} name objects were created successfully')
+
+
+def store_name_object(name: str, nationalize_data: dict) -> tuple:
+    """
+    Storing a name fetched from nationalize API, once across processes. Only database work
+    runs under the advisory lock, never the upstream call.
+    Names without predictions are not stored but recorded in the negative cache.
+    Returns (name_object, created); name_object is None for names without predictions
+    """
+    if not nationalize_data.get('country'):
+        logger.warning(f'No predictions for name {name} in nationalize API')
+        name_negative_cache.record(name)
+        return None, False
+
+    with advisory_lock(f'name:{name}'):
+        # The name could have been created by another process while waiting for the lock
+        name_object = UniqueName.objects.filter(name=name).first()
+        if name_object:
+            return name_object, False
+
+        try:
+            with transaction.atomic():
+                name_object = UniqueName.objects.create(name=name)
+        except IntegrityError:
+            return UniqueName.objects.get(name=name), False
+        logger.info(f'Name object with name {name} was created successfully')
+
+        create_or_update_country_and_probability_objects(name_object, nationalize_data)
+        return name_object, True
+
+
+def create_name_object(name: str) -> tuple:
+    """
+    Fetching a new name from nationalize API and storing it. Processes share one fetch through
+    the name lease: the others wait for it and answer from what it stored.
+    Returns (name_object, created); name_object is None on upstream errors and for names without predictions
+    """
+    with name_fetch_lease.hold(name) as leader:
+        name_object = UniqueName.objects.filter(name=name).first()
+        if name_object:
+            return name_object, False
+        if not leader and name_negative_cache.get(name):
+            return None, False
+
+        nationalize_data = parse_name_data(name)
+        if not nationalize_data:
+            return None, False
+        return store_name_object(name, nationalize_data)
+
+
+def unresolved_name_response(entry: dict) -> Response:
+    """
+    Answering for a name nationalize API has no predictions for with its negative cache state,
+    so clients can tell it from an upstream outage
+    """
+    state = NegativeCache.state(entry)
+    return Response(
+        {'error': 'No data in Nationalize API', 'negative_cache': state},
+        status=status.HTTP_404_NOT_FOUND,
+        headers={'Retry-After': str(state['retry_after'])},
+    )
+
+
+def estimated_name_data(name: str) -> dict or None:
+    """
+    Creating the answer for a name nationalize API failed for from the local name model, if it is loaded.
+    The estimate is neither stored nor cached, so the name is fetched again by the next request
+    """
+    predictions = name_model.predict(name)
+    if not predictions:
+        return None
+    return FinalAnswerSerializer(instance={
+        'name': name,
+        'requests_count': 0,
+        'country_predictions': predictions,
+        'estimated': True,
+    }).data
+
+
+def failed_name_response(name: str, unresolved: dict or None, expand: bool) -> Response:
+    """
+    Answering for a name that could not be created, told apart by its negative cache entry.
+    Upstream failures are answered with an estimate when the local name model has one
+    """
+    if unresolved:
+        return unresolved_name_response(unresolved)
+    estimate = estimated_name_data(name)
+    if estimate:
+        NAME_ESTIMATES.labels('name-stats').inc()
+        logger.warning(f'Nationalize API failed for {name}, answered with an estimate')
+        return Response(expand_name_data(estimate, expand), status=status.HTTP_200_OK)
+    return Response({'error': 'Nationalize API error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def acreate_name_object(name: str) -> tuple:
+    """
+    Creating a name object like create_name_object, waiting on the lease and nationalize API
+    asynchronously and running only the database part in a thread
+    """
+    async with name_fetch_lease.ahold(name) as leader:
+        name_object = await UniqueName.objects.filter(name=name).afirst()
+        if name_object:
+            return name_object, False
+        if not leader and await name_negative_cache.aget(name):
+            return None, False
+
+        nationalize_data = await aparse_name_data(name)
+        if not nationalize_data:
+            return None, False
+        return await sync_to_async(store_name_object)(name, nationalize_data)
+
+
+def build_name_response(name_object: UniqueName, name_param: str) -> dict:
+    """
+    Creating the name-stats answer and caching it until the name data goes stale
+    """
+    # Countries are rendered from the country cache by country_id,
+    # so the predictions are loaded with a single query however many countries there are:
+    probabilities = list(name_object.country_probabilities.values('probability', 'country_id'))
+    final_data = {
+        'name': name_object.name,
+        'requests_count': name_object.request_count + request_counter.pending(name_param),
+        'country_predictions': probabilities
+    }
+    with timed('serialize', SERIALIZATION_TIME, view='name-stats'):
+        data = FinalAnswerSerializer(instance=final_data).data
+    set_cached_name_response(name_object.name, data, name_object.refreshed_at, name_object.request_count)
+    return data
+
+
+# Name-stats expand parameter values: embedded Country records, or country codes only
+EXPANSIONS = ('country', 'none')
+
+
+def parse_name_params(request) -> tuple:
+    """
+    Getting the canonical name and the country expansion of a name-stats request.
+    Returns (name, expand, error_response)
+    """
+    # Names are looked up, cached and counted by their canonical key
+    name_param = normalize_name(request.query_params.get('name', ''))
+    expand = request.query_params.get('expand', 'country')
+    if not name_param:
+        logger.error('Name parameter is missing')
+        return None, None, Response({'error': 'Name parameter is missing'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(name_param) > MAX_NAME_LENGTH:
+        return None, None, Response(
+            {'error': f'Name must be at most {MAX_NAME_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if expand not in EXPANSIONS:
+        return None, None, Response(
+            {'error': f'Expand must be one of {", ".join(EXPANSIONS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return name_param, expand == 'country', None
+
+
+def expand_name_data(data: dict, expand: bool) -> dict:
+    """
+    Replacing the embedded country records of a name-stats answer with their codes unless expanded.
+    Cached answers always embed the records, so both forms share one cache entry
+    """
+    if expand:
+        return data
+    return {
+        **data,
+        'country_predictions': [
+            {
+                'probability': prediction['probability'],
+                'country': prediction['country'] and prediction['country']['code'],
+            }
+            for prediction in data['country_predictions']
+        ],
+    }
+
+
+expand_parameter = OpenApiParameter(
+    name='expand',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    enum=list(EXPANSIONS),
+    description=(
+        'Embed the full country records in predictions (`country`, default) or return country codes '
+        'only (`none`); country records are available from /api/countries/.'
+    )
+)
+
+# Shared by the sync views and their async counterparts in async_views
+name_stats_schema = extend_schema(
+    summary="Get name statistics",
+    description="Get statistics for a given name by country",
+    parameters=[
+        OpenApiParameter(
+            name='name',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Name to get statistics for.'
+        ),
+        expand_parameter,
+    ],
+    responses={
+        200: FinalAnswerSerializer,
+        400: OpenApiTypes.OBJECT,
+        404: OpenApiTypes.OBJECT,
+        500: OpenApiTypes.OBJECT,
+    }
+)
+
+
+class NameStatsView(APIView):
+    @name_stats_schema
     def get(self, request, *args, **kwargs):
-        name_param = request.query_params.get('name')
-        if not name_param:
-            logger.error('Name parameter is missing')
-            return Response({'error': 'Name parameter is missing'},status=status.HTTP_400_BAD_REQUEST)
+        name_param, expand, error_response = parse_name_params(request)
+        if error_response:
+            return error_response
+
+        # Name is cached and data is fresh
+        cached_data = get_cached_name_response(name_param)
+        if cached_data:
+            NAME_LOOKUPS.labels('hit').inc()
+            request_counter.increment(name_param)
+            cached_data['requests_count'] += request_counter.pending(name_param)
+            logger.info(f'Cached answer for {name_param} returned successfully')
+            return Response(expand_name_data(cached_data, expand), status=status.HTTP_200_OK)
 
+        pin_primary_if_written(name_param)
         name_object = UniqueName.objects.filter(name=name_param).first()
         if name_object:
-            # Name exists in DB and data is fresh
-            if timezone.now() - name_object.last_accessed_at < timedelta(days=1):
-                name_object.last_accessed_at = timezone.now()
-                name_object.request_count += 1
-                name_object.save(update_fields=['last_accessed_at', 'request_count'])
+            request_counter.increment(name_param)
 
-            # Name exists in DB and data is not fresh
+            # Name exists in DB and data is not fresh: answering with stored data, refreshing in background
+            if timezone.now() - name_object.refreshed_at >= settings.NAME_FRESHNESS:
+                NAME_LOOKUPS.labels('stale').inc()
+                if name_refresher.enqueue(name_param):
+                    logger.info(f'Refresh for stale name {name_param} was queued')
             else:
-                nationalize_data = parse_name_data(name_param)
-                if not nationalize_data:
-                    return Response({'error': 'Nationalize API error'},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                create_or_update_country_and_probability_objects(name_object, nationalize_data)
+                NAME_LOOKUPS.labels('miss').inc()
 
-        # If no name data in base
+        # If no name data in base. Concurrent requests for the name wait for a single upstream fetch
         else:
-            nationalize_data = parse_name_data(name_param)
-            if not nationalize_data:
-                return Response({'error': 'Nationalize API error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            name_object = UniqueName.objects.create(name=name_param)
-            logger.info(f'Name object with name {name_param} was created successfully')
-            create_or_update_country_and_probability_objects(name_object, nationalize_data)
-
-        # Creating final answer
-        probabilities = name_object.country_probabilities.all()
-        final_data = {
-            'name': name_object.name,
-            'requests_count': name_object.request_count,
-            'country_predictions': probabilities
-        }
-        final_serializer = FinalAnswerSerializer(instance=final_data)
+            # Names nationalize API has no predictions for are not requested again until their negative entry expires
+            unresolved = name_negative_cache.get(name_param)
+            if unresolved:
+                NAME_LOOKUPS.labels('negative').inc()
+                return unresolved_name_response(unresolved)
+
+            # A replica may not have the name yet, the rest of the request reads what the primary has
+            pin_primary()
+            (name_object, created), shared = name_flight.do(name_param, create_name_object, name_param)
+            NAME_LOOKUPS.labels('cold').inc()
+            if not name_object:
+                return failed_name_response(name_param, name_negative_cache.get(name_param), expand)
+            if shared or not created:
+                request_counter.increment(name_param)
+
+        final_data = build_name_response(name_object, name_param)
 
         logger.info(f'Answer for {name_param} returned successfully')
-        return Response(final_serializer.data, status=status.HTTP_200_OK)
+        return Response(expand_name_data(final_data, expand), status=status.HTTP_200_OK)
+
+
+# Popular names ranking parameter values and the leaderboard fields they order by
+RANKINGS = {
+    'count': 'request_count',
+    'weighted': 'weighted_score',
+}
+
+
+popular_names_schema = extend_schema(
+    summary="Get popular names by country",
+    description=(
+        "Returns the most popular names for a given country code, top 5 by default. "
+        "Further pages are linked from the `Link` response header."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='country',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Country code to get popular names for.'
+        ),
+        OpenApiParameter(
+            name='limit',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Number of names to return (5 by default, at most 100).'
+        ),
+        OpenApiParameter(
+            name='ranking',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            enum=list(RANKINGS),
+            description=(
+                'Order by request count (`count`, default) or by request count weighted '
+                'by the name probability for the country (`weighted`).'
+            )
+        ),
+        OpenApiParameter(
+            name='window',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            enum=list(settings.POPULAR_NAMES_WINDOWS),
+            description=(
+                'Rank by requests within a recent window only, ending with the current hour. '
+                'Frequencies are then counts within the window. All requests ever made count by default.'
+            )
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Cursor of the next page, taken from the `Link` header of the previous one.'
+        ),
+    ],
+    responses={
+        200: PopularNameSerializer(many=True),
+        400: OpenApiTypes.OBJECT,
+        404: OpenApiTypes.OBJECT,
+    }
+)
+
+
+def parse_popular_names_params(request) -> tuple:
+    """
+    Getting the page size, ranking, window and cursor position of a popular names request.
+    Returns (limit, ranking, window, position, error_response)
+    """
+    try:
+        limit = int(request.query_params.get('limit', settings.POPULAR_NAMES_DEFAULT_LIMIT))
+        ranking = request.query_params.get('ranking', 'count')
+        if ranking not in RANKINGS:
+            raise ValueError(f'Unknown ranking: {ranking}')
+        window = request.query_params.get('window')
+        if window is not None and window not in settings.POPULAR_NAMES_WINDOWS:
+            raise ValueError(f'Unknown window: {window}')
+        cursor = request.query_params.get('cursor')
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        logger.error(f'Invalid popular names pagination parameters: {e}')
+        return None, None, None, None, Response(
+            {'error': 'Invalid limit, ranking, window or cursor parameter'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= limit <= settings.POPULAR_NAMES_MAX_LIMIT:
+        return None, None, None, None, Response(
+            {'error': f'Limit must be between 1 and {settings.POPULAR_NAMES_MAX_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return limit, ranking, window, position, None
+
+
+def leaderboard_page(country_code: str, score_field: str, window: str or None, position, limit: int) -> list:
+    """
+    Reading (name, request_count, score) rows of the all-time or the window leaderboard
+    after the cursor position, through its (country, score, name) index
+    """
+    if window:
+        ranks_qs = CountryNameWindowRank.objects.filter(window=window, country_id=country_code)
+    else:
+        ranks_qs = CountryNameRank.objects.filter(country_id=country_code)
+    if position:
+        ranks_qs = ranks_qs.filter(after_cursor(score_field, 'name_id', *position))
+    return list(
+        ranks_qs.order_by(f'-{score_field}', 'name_id').values_list('name_id', 'request_count', score_field)[:limit]
+    )
+
+
+def popular_names_response(request) -> Response:
+    """
+    Answering a popular names request from the leaderboard
+    """
+    country_code = request.query_params.get('country')
+
+    if not country_code:
+        logger.error('Country code parameter is missing')
+        return Response({'error': 'Country code parameter is missing'}, status=status.HTTP_400_BAD_REQUEST)
+
+    limit, ranking, window, position, error_response = parse_popular_names_params(request)
+    if error_response:
+        return error_response
+
+    if country_cache.get(country_code) is None:
+        logger.error('Country with such code does not exist in database')
+        return Response(
+            {'error': 'Country with such code does not exist in database'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    rows = leaderboard_page(country_code, RANKINGS[ranking], window, position, limit + 1)
+
+    if not rows and not position:
+        logger.info(f'No names found for {country_code}')
+        return Response({'error': f'No names found for {country_code}'}, status=status.HTTP_404_NOT_FOUND)
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_name, _, last_score = rows[-1]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(last_score, last_name))
+        headers['Link'] = f'<{next_url}>; rel="next"'
+
+    final_data = [{'name': name, 'frequency': float(request_count)} for name, request_count, _ in rows]
+    return Response(final_data, status=status.HTTP_200_OK, headers=headers)
 
 
 class PopularNamesByCountryView(APIView):
+    @popular_names_schema
+    def get(self, request, *args, **kwargs):
+        return popular_names_response(request)
+
+
+def failed_batch_results(names: list[str], expand: bool) -> dict:
+    """
+    Answering the names of a batch chunk nationalize API failed for with estimates of the local
+    name model, or with an error for names it has none for
+    """
+    results = {}
+    for name in names:
+        estimate = estimated_name_data(name)
+        if estimate:
+            NAME_ESTIMATES.labels('name-stats-batch').inc()
+            results[name] = expand_name_data(estimate, expand)
+        else:
+            results[name] = {'error': 'Nationalize API error'}
+    return results
+
+
+def fetch_name_chunks(names: list[str]) -> list[tuple]:
+    """
+    Fetching names from nationalize API in chunks accepted by one request, NAME_BATCH_FETCH_WORKERS
+    chunks at a time. Returns (chunk, nationalize_data) pairs in order; data is None for chunks that
+    failed or were not answered within NAME_BATCH_DEADLINE seconds, so a batch never waits longer
+    """
+    chunk_size = settings.NATIONALIZE_BATCH_SIZE
+    chunks = [names[start:start + chunk_size] for start in range(0, len(names), chunk_size)]
+    if not chunks:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=min(len(chunks), settings.NAME_BATCH_FETCH_WORKERS))
+    # Each chunk runs in a copy of the request context, so its upstream time is in the Server-Timing header
+    futures = [executor.submit(copy_context().run, parse_names_data, chunk) for chunk in chunks]
+    done, not_done = wait(futures, timeout=settings.NAME_BATCH_DEADLINE)
+    # Chunks not started yet are dropped; running ones end with their upstream timeout, unused
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        logger.warning(f'{len(not_done)} of {len(chunks)} name chunks were not fetched before the batch deadline')
+    return [(chunk, future.result() if future in done else None) for chunk, future in zip(chunks, futures, strict=True)]
+
+
+class NameStatsBatchView(APIView):
+    def get_throttle_cost(self, request) -> int:
+        """
+        Charging the rate limit one request per nationalize API request the batch may take
+        """
+        names = request.data.get('names') if isinstance(request.data, dict) else None
+        if not isinstance(names, list):
+            return 1
+        return max(1, math.ceil(min(len(names), settings.NAME_BATCH_MAX_NAMES) / settings.NATIONALIZE_BATCH_SIZE))
+
     @extend_schema(
-        summary="Get popular names by country",
-        description="Returns the top 5 most popular names for a given country code.",
-        parameters=[
-            OpenApiParameter(
-                name='country',
-                type=OpenApiTypes.STR,
-                location=OpenApiParameter.QUERY,
-                required=True,
-                description='Country code to get popular names for.'
-            )
-        ],
+        summary="Get statistics for several names",
+        description=(
+            "Get statistics for up to NAME_BATCH_MAX_NAMES names at once. Returns a map from each name "
+            "to its statistics or to an error for names that could not be resolved."
+        ),
+        request=NameBatchSerializer,
+        parameters=[expand_parameter],
         responses={
-            200: PopularNameSerializer(many=True),
+            200: OpenApiTypes.OBJECT,
             400: OpenApiTypes.OBJECT,
-            404: OpenApiTypes.OBJECT,
         }
     )
-    def get(self, request, *args, **kwargs):
-        country_code = request.query_params.get('country')
+    def post(self, request, *args, **kwargs):
+        serializer = NameBatchSerializer(data=request.data)
+        expand = request.query_params.get('expand', 'country')
+        if not serializer.is_valid():
+            logger.error(f'Invalid batch request: {serializer.errors}')
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if expand not in EXPANSIONS:
+            return Response(
+                {'error': f'Expand must be one of {", ".join(EXPANSIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        names = list(dict.fromkeys(serializer.validated_data['names']))
 
-        if not country_code:
-            logger.error('Country code parameter is missing')
-            return Response({'error': 'Country code parameter is missing'}, status=status.HTTP_400_BAD_REQUEST)
+        # Names known to database are answered with two queries in total
+        name_objects = {name_object.name: name_object for name_object in UniqueName.objects.filter(name__in=names)}
+        for name_object in name_objects.values():
+            request_counter.increment(name_object.name)
+            if timezone.now() - name_object.refreshed_at >= settings.NAME_FRESHNESS:
+                name_refresher.enqueue(name_object.name)
 
-        try:
-            country_object = Country.objects.get(code=country_code)
+        # Unknown names are fetched in chunks of names accepted by one nationalize API request,
+        # except names it recently had no predictions for
+        errors = {
+            name: {'error': 'No data in Nationalize API', 'negative_cache': NegativeCache.state(entry)}
+            for name, entry in name_negative_cache.get_many(
+                [name for name in names if name not in name_objects]
+            ).items()
+        }
+        missing_names = [name for name in names if name not in name_objects and name not in errors]
+        for chunk, nationalize_data in fetch_name_chunks(missing_names):
+            if nationalize_data is None:
+                errors.update(failed_batch_results(chunk, expand == 'country'))
+                continue
+
+            nationalize_data = [
+                name_data for name_data in nationalize_data
+                if name_data.get('name') in chunk and name_data.get('country')
+            ]
+            create_name_objects(nationalize_data)
+            resolved_names = {name_data['name'] for name_data in nationalize_data}
+            errors.update({
+                name: {
+                    'error': 'No data in Nationalize API',
+                    'negative_cache': NegativeCache.state(name_negative_cache.record(name)),
+                }
+                for name in chunk if name not in resolved_names
+            })
 
-        except Country.DoesNotExist:
-            logger.error('Country with such code does not exist in database')
+        name_objects.update(
+            (name_object.name, name_object)
+            for name_object in UniqueName.objects.filter(name__in=[name for name in missing_names if name not in errors])
+        )
+
+        predictions = defaultdict(list)
+        for probability in NameCountryProbability.objects.filter(name__in=name_objects).values(
+            'name_id', 'probability', 'country_id'
+        ):
+            predictions[probability['name_id']].append(probability)
+
+        results = {}
+        for name in names:
+            if name in errors:
+                results[name] = errors[name]
+                continue
+            results[name] = expand_name_data(FinalAnswerSerializer(instance={
+                'name': name,
+                'requests_count': name_objects[name].request_count + request_counter.pending(name),
+                'country_predictions': predictions[name],
+            }).data, expand == 'country')
+
+        logger.info(f'Batch answer for {len(names)} names returned successfully')
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+def conditional_country_response(request, data, etag: str, last_modified) -> Response:
+    """
+    Answering with 304 Not Modified when the client's copy is current, otherwise with the data.
+    Both carry the ETag, Last-Modified and Cache-Control headers
+    """
+    etag = f'"{etag}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    headers = {'ETag': etag, 'Cache-Control': f'private, max-age={settings.COUNTRY_CACHE_TTL}'}
+    if timestamp:
+        headers['Last-Modified'] = http_date(timestamp)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+    return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+
+class CountryListView(APIView):
+    @extend_schema(
+        summary="Get all countries",
+        description=(
+            "Returns every country record referenced by name predictions. The list changes rarely, "
+            "so clients should revalidate it with `If-None-Match` or `If-Modified-Since`."
+        ),
+        responses={
+            200: CountrySerializer(many=True),
+            304: None,
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        countries, etag, last_modified = country_cache.catalogue()
+        return conditional_country_response(request, countries, etag, last_modified)
+
+
+class CountryDetailView(APIView):
+    @extend_schema(
+        summary="Get a country",
+        description="Returns the country record with the given code, revalidated like the country list.",
+        responses={
+            200: CountrySerializer,
+            304: None,
+            404: OpenApiTypes.OBJECT,
+        }
+    )
+    def get(self, request, code, *args, **kwargs):
+        code = code.upper()
+        country = country_cache.get(code)
+        if country is None:
             return Response(
                 {'error': 'Country with such code does not exist in database'},
                 status=status.HTTP_404_NOT_FOUND
             )
-
-        names_qs = UniqueName.objects.filter(country_probabilities__country=country_object).order_by('-request_count')
-        if not names_qs.exists():
-            logger.info(f'No names found for {country_code}')
-            return Response({'error': f'No names found for {country_code}'}, status=status.HTTP_404_NOT_FOUND)
-
-        else:
-            final_data = []
-            for name_object in names_qs:
-                final_data.append({
-                    'name': name_object.name,
-                    'frequency': name_object.request_count
-                })
-
-            serializer = PopularNameSerializer(data=final_data, many=True)
-            if serializer.is_valid(raise_exception=True):
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            else:
-                return Response({'error': 'Unexpected error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        etag = hashlib.md5(orjson.dumps(country)).hexdigest()
+        return conditional_country_response(request, country, etag, country_cache.get_updated_at(code))
@@ -0,0 +1,247 @@
+"""
+Load benchmark of the name-stats and popular-names endpoints.
+
+Starts local Nationalize.io and REST Countries stubs (see stubs.py) with configurable
+latency and error rate, seeds a throwaway test database through them and replays
+Zipf-distributed traffic against NameStatsView and PopularNamesByCountryView from
+`--concurrency` threads. Every scenario reports requests/sec, p50/p95/p99 latency,
+database queries per request and the share of failed (5xx) requests:
+
+* names-warm     cached answers for known names
+* names-cold     names unknown to the database, fetched from the Nationalize stub
+* names-stale    known names past NAME_FRESHNESS, answered from the database and refreshed in background
+* popular-warm   popular names with the country cache loaded
+* popular-cold   popular names right after the country cache was dropped
+
+With --smoke the run is small and every scenario is checked against SMOKE_THRESHOLDS;
+the script exits with status 1 on a regression, so it can run in CI.
+
+Usage: python benchmarks/load.py [--requests 500] [--concurrency 8] [--latency 0.05] [--error-rate 0.01]
+       python benchmarks/load.py --smoke
+"""
+import argparse
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'namebase.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    setup_test_environment,
+)
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+from stubs import COUNTRY_CODES, nationalize_record, start_stubs  # noqa: E402
+
+from api.cache import country_cache  # noqa: E402
+from api.counters import request_counter  # noqa: E402
+from api.leaderboard import rebuild_leaderboard  # noqa: E402
+from api.models import UniqueName  # noqa: E402
+from api.tasks import name_refresher  # noqa: E402
+from api.upstream import (  # noqa: E402
+    async_nationalize_client,
+    nationalize_client,
+    restcountries_client,
+)
+from api.views import (  # noqa: E402
+    NameStatsView,
+    PopularNamesByCountryView,
+    create_name_objects,
+)
+
+# Smoke mode limits per scenario: (p95 ms, queries per request, share of failed requests)
+SMOKE_THRESHOLDS = {
+    'names-warm': (25, 0, 0),
+    'names-cold': (250, 20, 0),
+    'names-stale': (50, 2, 0),
+    'popular-warm': (25, 1, 0),
+    'popular-cold': (50, 2, 0),
+}
+
+
+def zipf_sample(population: list, size: int, exponent: float) -> list:
+    """
+    Drawing `size` items where the item of rank k is requested 1 / k ** exponent as often as the first
+    """
+    weights = [1 / rank ** exponent for rank in range(1, len(population) + 1)]
+    return random.choices(population, weights=weights, k=size)
+
+
+def seed(names: list[str]) -> None:
+    call_command('sync_countries', stdout=StringIO())
+    for start in range(0, len(names), 1000):
+        create_name_objects([nationalize_record(name) for name in names[start:start + 1000]])
+    # Request counts follow the same Zipf law as the traffic
+    name_objects = list(UniqueName.objects.filter(name__in=names))
+    rank = {name: index for index, name in enumerate(names, 1)}
+    for name_object in name_objects:
+        name_object.request_count = int(100000 / rank[name_object.name])
+    UniqueName.objects.bulk_update(name_objects, ['request_count'], batch_size=1000)
+    rebuild_leaderboard()
+
+
+def run(view, path: str, params: list[dict], user, concurrency: int, before=None) -> dict:
+    """
+    Replaying GET requests with `params` against a view from `concurrency` threads
+    """
+    factory = APIRequestFactory()
+    pending = queue.Queue()
+    for item in params:
+        pending.put(item)
+    results = []
+
+    def worker():
+        try:
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                if before:
+                    before()
+                request = factory.get(path, item)
+                force_authenticate(request, user)
+                with CaptureQueriesContext(connections['default']) as queries:
+                    started = time.perf_counter()
+                    try:
+                        failed = view(request).status_code >= 500
+                    except Exception as e:
+                        print(f'{path} {item} failed: {e!r}', file=sys.stderr)
+                        failed = True
+                    elapsed = (time.perf_counter() - started) * 1000
+                results.append((elapsed, len(queries), failed))
+        finally:
+            # Every thread has its own connection, which would keep the test database busy
+            connections.close_all()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    timings = sorted(elapsed for elapsed, _, _ in results)
+    queries = [count for _, count, _ in results]
+    return {
+        'requests': len(results),
+        'rps': len(results) / wall,
+        'p50': statistics.median(timings),
+        'p95': timings[max(int(len(timings) * 0.95) - 1, 0)],
+        'p99': timings[max(int(len(timings) * 0.99) - 1, 0)],
+        'queries': statistics.mean(queries),
+        'max_queries': max(queries),
+        'errors': sum(failed for _, _, failed in results) / len(results),
+    }
+
+
+def force_request(url: str, user):
+    request = APIRequestFactory().get(url)
+    force_authenticate(request, user)
+    return request
+
+
+def scenarios(args, user, names: list[str]):
+    names_view = NameStatsView.as_view(throttle_classes=[])
+    popular_view = PopularNamesByCountryView.as_view(throttle_classes=[])
+
+    warm = zipf_sample(names, args.requests, args.zipf)
+    for name in set(warm):
+        names_view(force_request(f'/api/names/?name={name}', user))
+    yield 'names-warm', run(names_view, '/api/names/', [{'name': name} for name in warm], user, args.concurrency)
+
+    cold = [{'name': f'cold{index}'} for index in range(args.requests)]
+    yield 'names-cold', run(names_view, '/api/names/', cold, user, args.concurrency)
+
+    popular = [{'country': code} for code in zipf_sample(list(COUNTRY_CODES), args.requests, args.zipf)]
+    country_cache.load()
+    yield 'popular-warm', run(popular_view, '/api/popular-names/', popular, user, args.concurrency)
+    yield 'popular-cold', run(
+        popular_view, '/api/popular-names/', popular, user, args.concurrency, before=country_cache.invalidate
+    )
+
+    # Last, as the background refreshes it queues keep running after it
+    UniqueName.objects.update(refreshed_at=timezone.now() - timedelta(days=30))
+    cache.clear()
+    stale = random.sample(names, min(args.requests, len(names)))
+    yield 'names-stale', run(names_view, '/api/names/', [{'name': name} for name in stale], user, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--names', type=int, default=2000, help='Names seeded into the database.')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exponent of the Zipf distribution of requests.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds every stub response is delayed by.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of stub responses failing with 503.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--smoke', action='store_true', help='Small run checked against SMOKE_THRESHOLDS.')
+    args = parser.parse_args()
+    if args.smoke:
+        args.requests, args.names, args.concurrency, args.latency, args.error_rate = 100, 200, 4, 0.0, 0.0
+    if connection.vendor == 'sqlite' and args.concurrency > 1:
+        print('SQLite locks the whole database on writes, running the scenarios from a single thread')
+        args.concurrency = 1
+    random.seed(args.seed)
+
+    nationalize, restcountries = start_stubs()
+    # The upstream clients are created on import, so they are pointed at the stubs here
+    nationalize_client.base_url = async_nationalize_client.base_url = nationalize.url
+    restcountries_client.base_url = restcountries.url
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    failures = []
+    try:
+        user = User.objects.create_user(username='benchmark')
+        names = [f'name{index}' for index in range(args.names)]
+        seed(names)
+        for stub in (nationalize, restcountries):
+            stub.latency, stub.jitter, stub.error_rate = args.latency, args.latency / 2, args.error_rate
+
+        print(f'{"scenario":<14} {"requests":>8} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+              f'{"queries":>8} {"errors":>7}')
+        for label, stats in scenarios(args, user, names):
+            print(f'{label:<14} {stats["requests"]:>8} {stats["rps"]:>8.1f} {stats["p50"]:>8.2f} '
+                  f'{stats["p95"]:>8.2f} {stats["p99"]:>8.2f} {stats["queries"]:>8.2f} {stats["errors"]:>7.1%}')
+            if args.smoke:
+                p95, queries, errors = SMOKE_THRESHOLDS[label]
+                if stats['p95'] > p95 or stats['max_queries'] > queries or stats['errors'] > errors:
+                    failures.append(f'{label}: p95 {stats["p95"]:.2f} ms, {stats["max_queries"]} queries, '
+                                    f'{stats["errors"]:.1%} errors exceed {p95} ms, {queries} queries, {errors:.1%}')
+        while name_refresher.in_flight():
+            time.sleep(0.1)
+        print(f'Nationalize stub: {nationalize.requests} requests, REST Countries stub: {restcountries.requests}')
+    finally:
+        request_counter.flush()
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        nationalize.stop()
+        restcountries.stop()
+
+    for failure in failures:
+        print(f'FAILED {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Popular names latency benchmark.
+
+Seeds a throwaway test database with a growing number of names and times the first page
+of PopularNamesByCountryView for a country at every size. With the popularity index the
+latency should stay flat however many names the country has.
+
+Usage: python benchmarks/popular_names.py [--sizes 1000 10000 100000] [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'namebase.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from api.cache import country_cache  # noqa: E402
+from api.leaderboard import rebuild_leaderboard  # noqa: E402
+from api.models import Country, NameCountryProbability, UniqueName  # noqa: E402
+from api.views import PopularNamesByCountryView  # noqa: E402
+
+COUNTRY_CODES = ('GB', 'US', 'FR')
+
+
+def seed(start: int, stop: int) -> None:
+    for chunk_start in range(start, stop, 5000):
+        names = [
+            UniqueName(name=f'name{index}', request_count=(index * 7919) % 100000)
+            for index in range(chunk_start, min(chunk_start + 5000, stop))
+        ]
+        UniqueName.objects.bulk_create(names)
+        NameCountryProbability.objects.bulk_create(
+            NameCountryProbability(name=name, country_id=COUNTRY_CODES[index % len(COUNTRY_CODES)], probability=0.5)
+            for index, name in enumerate(names, chunk_start)
+        )
+
+
+def measure(view, user, repeat: int) -> list[float]:
+    factory = APIRequestFactory()
+    timings = []
+    for _ in range(repeat):
+        request = factory.get('/api/popular-names/', {'country': 'GB'})
+        force_authenticate(request, user)
+        started = time.perf_counter()
+        response = view(request)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        for code in COUNTRY_CODES:
+            Country.objects.create(code=code, name_common=code, name_official=code)
+        country_cache.invalidate()
+        user = User.objects.create_user(username='benchmark')
+        view = PopularNamesByCountryView.as_view(throttle_classes=[])
+
+        print(f'{"names":>10} {"p50 ms":>8} {"p95 ms":>8}')
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed(seeded, size)
+            rebuild_leaderboard()
+            seeded = size
+            measure(view, user, 5)  # warm-up
+            timings = sorted(measure(view, user, args.repeat))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f'{size:>10} {statistics.median(timings):>8.2f} {p95:>8.2f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Startup time and per-request overhead of the full and the API-only (API_ONLY) profiles.
+
+Every measurement runs in fresh processes with the profile set through the environment:
+
+* startup   wall time of a process that sets up Django and builds the WSGI application
+            with its middleware chain and URL configuration, median of `--runs` processes
+* request   time spent by the WSGI application on an unauthenticated /api/countries/ request
+            (middleware, URL resolution, DRF authentication, rendering and the 401 log record),
+            which needs no database, median and p99 of `--requests` requests in one process
+
+Usage: python benchmarks/startup.py [--runs 10] [--requests 5000]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PROFILES = {
+    'full': 'False',
+    'api-only': 'True',
+}
+
+
+def child(mode: str, requests: int) -> dict:
+    """
+    Measuring the current process, which was started with the profile under test
+    """
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'namebase.settings')
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    application = get_wsgi_application()
+    # Importing the URL configuration with every view module, as the first request would
+    get_resolver().resolve('/api/countries/')
+    result = {'apps': len(settings.INSTALLED_APPS), 'middleware': len(settings.MIDDLEWARE)}
+    if mode == 'startup':
+        return result
+
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/api/countries/',
+        'QUERY_STRING': '',
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': '127.0.0.1',
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+    }
+
+    def start_response(status, headers):
+        assert status.startswith('401'), status
+
+    timings = []
+    for index in range(requests + 100):
+        started = time.perf_counter()
+        response = application(dict(environ), start_response)
+        b''.join(response)
+        response.close()
+        # The first requests warm up lazy imports and caches
+        if index >= 100:
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    result['p50'] = statistics.median(timings)
+    result['p99'] = timings[int(len(timings) * 0.99) - 1]
+    return result
+
+
+def run_child(profile: str, mode: str, requests: int) -> tuple:
+    env = {**os.environ, 'API_ONLY': PROFILES[profile], 'ALLOWED_HOSTS': '127.0.0.1'}
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, '--requests', str(requests)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return time.perf_counter() - started, json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Processes started per profile.')
+    parser.add_argument('--requests', type=int, default=5000, help='Requests timed per profile.')
+    parser.add_argument('--child', choices=['startup', 'request'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.child, args.requests)))
+        return
+
+    print(f'{"profile":<10} {"apps":>5} {"middleware":>10} {"startup ms":>11} {"request p50 us":>15} '
+          f'{"request p99 us":>15}')
+    for profile in PROFILES:
+        startups = [run_child(profile, 'startup', 0)[0] * 1000 for _ in range(args.runs)]
+        _, stats = run_child(profile, 'request', args.requests)
+        print(f'{profile:<10} {stats["apps"]:>5} {stats["middleware"]:>10} {statistics.median(startups):>11.1f} '
+              f'{stats["p50"]:>15.1f} {stats["p99"]:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Local stand-ins for Nationalize.io and REST Countries.
+
+Both answer any request with deterministic generated data after `latency` seconds
+(plus up to `jitter` seconds) and fail a share `error_rate` of requests with 503,
+so load tests neither depend on nor hammer the real APIs.
+
+Usage: python benchmarks/stubs.py [--latency 0.1] [--error-rate 0.01]
+Then point the service at the printed URLs with NATIONALIZE_URL / RESTCOUNTRIES_URL.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+COUNTRY_CODES = (
+    'GB', 'US', 'FR', 'DE', 'ES', 'IT', 'PL', 'UA', 'SE', 'NO',
+    'BR', 'MX', 'IN', 'CN', 'JP', 'NG', 'EG', 'TR', 'CA', 'AU',
+)
+
+
+def nationalize_record(name: str) -> dict:
+    """
+    Nationalize.io prediction for a name: three countries picked from a hash of the name
+    """
+    digest = hashlib.md5(name.encode()).digest()
+    codes = list(dict.fromkeys(COUNTRY_CODES[byte % len(COUNTRY_CODES)] for byte in digest[:3]))
+    probabilities = [0.6, 0.3, 0.1][:len(codes)]
+    return {
+        'count': digest[3] * 100,
+        'name': name,
+        'country': [
+            {'country_id': code, 'probability': probability}
+            for code, probability in zip(codes, probabilities, strict=True)
+        ],
+    }
+
+
+def restcountries_record(code: str) -> dict:
+    return {
+        'cca2': code,
+        'name': {'common': f'Country {code}', 'official': f'Republic of {code}'},
+        'altSpellings': [code],
+        'region': 'Stub',
+        'capital': [f'Capital {code}'],
+        'latlng': [0.0, 0.0],
+        'independent': True,
+        'maps': {'googleMaps': '', 'openStreetMaps': ''},
+        'flags': {'png': '', 'svg': '', 'alt': ''},
+        'coatOfArms': {'png': '', 'svg': ''},
+        'borders': [],
+    }
+
+
+def nationalize_response(path: str, query: dict) -> tuple:
+    if 'name[]' in query:
+        return 200, [nationalize_record(name) for name in query['name[]']]
+    if 'name' in query:
+        return 200, nationalize_record(query['name'][0])
+    return 422, {'error': 'Missing name parameter'}
+
+
+def restcountries_response(path: str, query: dict) -> tuple:
+    if path == '/all':
+        fields = query.get('fields', [''])[0].split(',')
+        records = [restcountries_record(code) for code in COUNTRY_CODES]
+        return 200, [{field: record[field] for field in fields if field in record} for record in records]
+    if path == '/alpha':
+        codes = query.get('codes', [''])[0].split(',')
+        return 200, [restcountries_record(code) for code in codes if code in COUNTRY_CODES]
+    if path.startswith('/alpha/') and path[len('/alpha/'):] in COUNTRY_CODES:
+        return 200, [restcountries_record(path[len('/alpha/'):])]
+    return 404, {'status': 404, 'message': 'Not Found'}
+
+
+class StubServer:
+    """
+    Threaded local HTTP server answering GET requests with `respond(path, query) -> (status, body)`
+    """
+
+    def __init__(self, respond, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                time.sleep(stub.latency + random.uniform(0, stub.jitter))
+                failed = random.random() < stub.error_rate
+                with stub._lock:
+                    stub.requests += 1
+                    stub.errors += failed
+                if failed:
+                    code, body = 503, {'error': 'Stub failure'}
+                else:
+                    code, body = respond(url.path.rstrip('/') or '/', parse_qs(url.query))
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_stubs(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, ports=(0, 0)) -> tuple:
+    """
+    Starting the Nationalize.io and REST Countries stubs, returns (nationalize, restcountries)
+    """
+    return (
+        StubServer(nationalize_response, latency, jitter, error_rate, port=ports[0]),
+        StubServer(restcountries_response, latency, jitter, error_rate, port=ports[1]),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds every response is delayed by.')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Random extra delay of up to this many seconds.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503.')
+    parser.add_argument('--ports', type=int, nargs=2, default=[9001, 9002])
+    args = parser.parse_args()
+
+    nationalize, restcountries = start_stubs(args.latency, args.jitter, args.error_rate, args.ports)
+    print(f'NATIONALIZE_URL={nationalize.url}')
+    print(f'RESTCOUNTRIES_URL={restcountries.url}')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        nationalize.stop()
+        restcountries.stop()
+
+
+if __name__ == '__main__':
+    main()
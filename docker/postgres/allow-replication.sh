@@ -0,0 +1,4 @@
+#!/bin/sh
+# Run once when the primary's data directory is created: lets the database user stream WAL to replicas
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,62 @@
+"""
+Production server profile: `gunicorn -c gunicorn.conf.py`
+
+Serves namebase.wsgi with threaded sync workers by default. With
+GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker it serves namebase.asgi
+with the async views instead.
+"""
+import multiprocessing
+import os
+import shutil
+
+ASGI_WORKER_CLASS = 'uvicorn_worker.UvicornWorker'
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+asgi = worker_class == ASGI_WORKER_CLASS
+wsgi_app = 'namebase.asgi:application' if asgi else 'namebase.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# An event loop keeps a core busy on its own; sync workers mostly wait on IO, so more of them fit
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count if asgi else cpu_count * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1 if asgi else 4))
+
+# Importing the project once in the master lets workers share its memory pages
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycling workers bounds the growth of per-process caches and leaks
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# Workers share metrics through files in this directory; files of a previous run would be merged in
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared between processes
+    from django.db import connections
+
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    # Drops the live metrics (gauges) of a dead worker when metrics are shared through files
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Request counts not flushed yet would be lost with the worker
+    from api.counters import request_counter
+
+    request_counter.flush()
@@ -0,0 +1,17 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'namebase.settings')
+# Under ASGI the name-stats and popular-names endpoints are served by their async views
+os.environ.setdefault('ASYNC_API_VIEWS', 'True')
+# Database work runs in per-request threads under ASGI, where persistent connections
+# would pile up instead of being reused, so Django advises disabling them
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+application = get_asgi_application()
+
+# Mapped once when the server loads the application (the gunicorn master when preloading),
+# so every worker answers with the name model from its first request
+from api.estimator import load_name_model  # noqa: E402
+
+load_name_model()
@@ -0,0 +1,50 @@
+import atexit
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+class QueuedRotatingFileHandler(QueueHandler):
+    """
+    Rotating log file written by a background thread, so request threads only put records
+    on a queue and never wait on file writes or rotation.
+
+    The writer thread is started on first use in every process, as threads don't survive
+    a fork (gunicorn preloads the app in the master). Queued records are written on exit
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding=None):
+        super().__init__(queue.SimpleQueue())
+        self.file_handler = RotatingFileHandler(
+            filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True
+        )
+        self.listener = None
+        self.pid = None
+
+    def setFormatter(self, fmt):
+        # Records are formatted in the writer thread; here they only get their message merged with args
+        self.file_handler.setFormatter(fmt)
+
+    def emit(self, record):
+        # Called under the handler lock, which logging reinitializes after a fork
+        if self.pid != os.getpid():
+            self.queue = queue.SimpleQueue()
+            self.listener = QueueListener(self.queue, self.file_handler)
+            self.listener.start()
+            self.pid = os.getpid()
+            atexit.register(self.stop)
+        super().emit(record)
+
+    def stop(self):
+        """
+        Writing the queued records and stopping the writer thread of this process
+        """
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    def close(self):
+        self.stop()
+        self.file_handler.close()
+        super().close()
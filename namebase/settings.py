@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 import environ
@@ -16,6 +17,37 @@ env = environ.Env(
     DB_PASS=(str, ""),
     DB_HOST=(str, ""),
     DB_PORT=(str, ""),
+    DB_CONN_MAX_AGE=(int, 60),
+    DB_REPLICA_HOSTS=(list, []),
+    DB_REPLICA_STICKY_SECONDS=(int, 10),
+    DB_REPLICA_RETRY_INTERVAL=(float, 30.0),
+
+    NATIONALIZE_URL=(str, "https://api.nationalize.io/"),
+    RESTCOUNTRIES_URL=(str, "https://restcountries.com/v3.1/"),
+    UPSTREAM_CONNECT_TIMEOUT=(float, 3.05),
+    UPSTREAM_READ_TIMEOUT=(float, 5.0),
+    UPSTREAM_RETRIES=(int, 2),
+    UPSTREAM_BACKOFF_FACTOR=(float, 0.2),
+    UPSTREAM_BACKOFF_JITTER=(float, 0.2),
+    UPSTREAM_POOL_SIZE=(int, 10),
+    UPSTREAM_ASYNC_POOL_SIZE=(int, 100),
+    UPSTREAM_BREAKER_THRESHOLD=(int, 5),
+    UPSTREAM_BREAKER_RESET_TIMEOUT=(float, 30.0),
+    COUNTRY_FETCH_WORKERS=(int, 8),
+    COUNTRY_FETCH_ON_REQUEST=(bool, False),
+    COUNTRY_CACHE_TTL=(int, 3600),
+    NEGATIVE_CACHE_TTL=(int, 3600),
+    NEGATIVE_CACHE_MAX_TTL=(int, 86400),
+    REQUEST_COUNT_FLUSH_INTERVAL=(float, 5.0),
+    NAME_REFRESH_WORKERS=(int, 4),
+    NAME_BATCH_MAX_NAMES=(int, 300),
+    ASYNC_API_VIEWS=(bool, False),
+    SERVER_TIMING_HEADER=(bool, True),
+    METRICS_ALLOWED_IPS=(list, ["127.0.0.1", "::1"]),
+    METRICS_TOKEN=(str, ""),
+    AUTH_TOKEN_CACHE_TTL=(int, 60),
+    API_ONLY=(bool, False),
+    NAME_MODEL_PATH=(str, ""),
 )
 
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -23,7 +55,7 @@ SECRET_KEY = env("DJANGO_SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env("DEBUG")
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=[])
 
 # Application definition
 INSTALLED_APPS = [
@@ -41,6 +73,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +84,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API-only profile for API worker processes: the token-authenticated JSON endpoints without admin,
+# sessions, messages, static files, browsable API and schema views, so every request passes a short
+# middleware chain and workers start faster. Migrations and the admin are run with the full profile
+API_ONLY = env("API_ONLY")
+if API_ONLY:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in (
+            'drf_spectacular',
+            'django.contrib.admin',
+            'django.contrib.sessions',
+            'django.contrib.messages',
+            'django.contrib.staticfiles',
+        )
+    ]
+    # DRF authenticates by token and is exempt from CSRF checks, JSON responses are not framed
+    MIDDLEWARE = [
+        'api.middleware.MetricsMiddleware',
+        'api.middleware.PrimaryPinningMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+
 ROOT_URLCONF = 'namebase.urls'
 
 TEMPLATES = [
@@ -79,9 +136,39 @@ DATABASES = {
         "PASSWORD": env("DB_PASS"),
         "HOST": env("DB_HOST"),
         "PORT": env("DB_PORT"),
+        # Persistent connections, checked before reuse so a dropped one is replaced transparently
+        "CONN_MAX_AGE": env("DB_CONN_MAX_AGE"),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas of the primary, e.g. DB_REPLICA_HOSTS=replica1,replica2:5433, with its database and credentials.
+# api.routers.PrimaryReplicaRouter sends reads to them and writes to the primary
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(env("DB_REPLICA_HOSTS"), start=1):
+    host, _, port = replica_host.partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        # An unreachable replica is given up on quickly and skipped for DB_REPLICA_RETRY_INTERVAL seconds
+        "OPTIONS": {"connect_timeout": 3},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+DATABASE_ROUTERS = ["api.routers.PrimaryReplicaRouter"]
+
+# Seconds reads of a just written name go to the primary, covering the replication lag
+DB_REPLICA_STICKY_SECONDS = env("DB_REPLICA_STICKY_SECONDS")
+DB_REPLICA_RETRY_INTERVAL = env("DB_REPLICA_RETRY_INTERVAL")
+
+
+# Cache
+# Shared between workers when pointed at Redis, e.g. CACHE_URL=redis://redis:6379/0
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+}
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,6 +208,7 @@ LOG_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# File handlers hand records to a background writer thread, off the request path
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -133,7 +221,7 @@ LOGGING = {
     'handlers': {
         'file_general': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'namebase.log_handlers.QueuedRotatingFileHandler',
             'filename': os.path.join(LOG_DIR, 'general.log'),
             'maxBytes': 1024*1024*5,
             'backupCount': 5,
@@ -142,7 +230,7 @@ LOGGING = {
         },
         'file_errors': {
             'level': 'ERROR',
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'namebase.log_handlers.QueuedRotatingFileHandler',
             'filename': os.path.join(LOG_DIR, 'errors.log'),
             'maxBytes': 1024*1024*5,
             'backupCount': 5,
@@ -172,19 +260,106 @@ LOGGING = {
 # REST
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.UserRateThrottle",
+        "api.throttling.SlidingWindowUserRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "user": "60/min",
     },
 }
+if API_ONLY:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['api.renderers.ORJSONRenderer']
+
+# Seconds resolved API tokens are cached for; deleted tokens and changed users are dropped at once
+AUTH_TOKEN_CACHE_TTL = env("AUTH_TOKEN_CACHE_TTL")
+
+# Upstream APIs
+NATIONALIZE_URL = env("NATIONALIZE_URL")
+RESTCOUNTRIES_URL = env("RESTCOUNTRIES_URL")
+UPSTREAM_CLIENT = {
+    "CONNECT_TIMEOUT": env("UPSTREAM_CONNECT_TIMEOUT"),
+    "READ_TIMEOUT": env("UPSTREAM_READ_TIMEOUT"),
+    "RETRIES": env("UPSTREAM_RETRIES"),
+    "BACKOFF_FACTOR": env("UPSTREAM_BACKOFF_FACTOR"),
+    "BACKOFF_JITTER": env("UPSTREAM_BACKOFF_JITTER"),
+    "POOL_SIZE": env("UPSTREAM_POOL_SIZE"),
+    "ASYNC_POOL_SIZE": env("UPSTREAM_ASYNC_POOL_SIZE"),
+    "BREAKER_THRESHOLD": env("UPSTREAM_BREAKER_THRESHOLD"),
+    "BREAKER_RESET_TIMEOUT": env("UPSTREAM_BREAKER_RESET_TIMEOUT"),
+}
+COUNTRY_FETCH_WORKERS = env("COUNTRY_FETCH_WORKERS")
+
+# Countries are preloaded with `manage.py sync_countries`; enable to also fetch unknown ones lazily
+COUNTRY_FETCH_ON_REQUEST = env("COUNTRY_FETCH_ON_REQUEST")
+COUNTRY_SNAPSHOT_PATH = BASE_DIR / "api" / "data" / "countries.json"
+
+# Seconds serialized countries are kept in each process before reloading
+COUNTRY_CACHE_TTL = env("COUNTRY_CACHE_TTL")
+
+# Name data older than this is served as is and refreshed from Nationalize in background;
+# cached responses expire with it
+NAME_FRESHNESS = timedelta(days=1)
+NAME_REFRESH_WORKERS = env("NAME_REFRESH_WORKERS")
+
+# Names accepted by the batch endpoint, and names sent in one nationalize API request
+NAME_BATCH_MAX_NAMES = env("NAME_BATCH_MAX_NAMES")
+NATIONALIZE_BATCH_SIZE = 10
+# Chunks of a batch fetched from nationalize API at once, and seconds a batch waits for them;
+# names of chunks not answered by then get estimates or errors
+NAME_BATCH_FETCH_WORKERS = 4
+NAME_BATCH_DEADLINE = 10
+
+# Seconds one process may fetch a name from upstream before others stop waiting for it and fetch it themselves
+FETCH_LEASE_TIMEOUT = 10
+
+# Local n-gram model answering names with an estimate while nationalize API fails, built by
+# `manage.py train_name_model` and mapped when a worker starts; without the file failures answer 500
+NAME_MODEL_PATH = Path(env("NAME_MODEL_PATH") or BASE_DIR / "api" / "data" / "name_model.bin")
+
+# Route the name-stats and popular-names endpoints to their async views (set by namebase/asgi.py)
+ASYNC_API_VIEWS = env("ASYNC_API_VIEWS")
+
+# Add a Server-Timing header with database, upstream and serialization times to every response
+SERVER_TIMING_HEADER = env("SERVER_TIMING_HEADER")
+
+# Addresses and networks (e.g. 10.0.0.0/8) allowed to read /metrics, and a bearer token
+# that allows it from anywhere else (empty disables token access)
+METRICS_ALLOWED_IPS = env("METRICS_ALLOWED_IPS")
+METRICS_TOKEN = env("METRICS_TOKEN")
+
+# Page sizes of the popular names endpoint
+POPULAR_NAMES_DEFAULT_LIMIT = 5
+POPULAR_NAMES_MAX_LIMIT = 100
+
+# Recent windows the popular names endpoint ranks by (`window` parameter), rebuilt by `manage.py rollup_requests`.
+# Hourly request buckets are kept for the longest one
+POPULAR_NAMES_WINDOWS = {
+    "day": timedelta(days=1),
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+}
+NAME_RESPONSE_CACHE = "default"
+# Seconds the request count of a cached name answer is trusted before it is read from database again;
+# flushes keep it current in between
+NAME_COUNT_CACHE_TTL = 60
+
+# Seconds names without Nationalize data and failed country codes are not requested again for,
+# doubled on every further failure up to the maximum
+NEGATIVE_CACHE_TTL = env("NEGATIVE_CACHE_TTL")
+NEGATIVE_CACHE_MAX_TTL = env("NEGATIVE_CACHE_MAX_TTL")
+
+# Seconds between flushes of accumulated name request counts to database (0 disables the flush thread)
+REQUEST_COUNT_FLUSH_INTERVAL = env("REQUEST_COUNT_FLUSH_INTERVAL")
 
 # Spectacular
 SPECTACULAR_SETTINGS = {
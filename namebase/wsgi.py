@@ -4,3 +4,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'namebase.settings')
 application = get_wsgi_application()
+
+# Mapped once when the server loads the application (the gunicorn master when preloading),
+# so every worker answers with the name model from its first request
+from api.estimator import load_name_model  # noqa: E402
+
+load_name_model()